@@ -0,0 +1,53 @@
+"""analysis/services/chat_cache.py - Cache odpowiedzi OpenAI Chat (Redis) po identycznym prompcie.
+
+Klucz = sha256(model + system prompt + user prompt). Przy temperature=0 ten sam
+prompt daje tę samą odpowiedź, więc ponowna analiza tego samego CV vs to samo
+stanowisko (re-run, reset, ta sama sekcja w innym matchingu) nie wymaga
+ponownego wywołania OpenAI. Cache'owane są tylko odpowiedzi, które dają się
+sparsować jako JSON — błędy i śmieci zawsze idą do API ponownie.
+"""
+
+import hashlib
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CHAT_CACHE_TTL = 60 * 60 * 24  # 24h
+
+
+def _key(model, system_prompt, user_prompt):
+    raw = '\0'.join((model, system_prompt, user_prompt))
+    return 'chat_response:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def cached_chat(client, system_prompt, user_prompt, ttl=CHAT_CACHE_TTL):
+    """OpenAIClient.chat() z cache po identycznym prompcie.
+
+    Returns:
+        dict jak z chat() — przy trafieniu 'tokens_used' = 0; dodatkowo
+        'parsed' (wynik parse_json_response), zeby wywolujacy nie parsowal
+        tej samej odpowiedzi drugi raz
+    """
+    key = _key(client.model, system_prompt, user_prompt)
+    try:
+        content = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Chat cache read failed: {e}")
+        content = None
+
+    if content is not None:
+        return {
+            'content': content, 'tokens_used': 0, 'error': None,
+            'parsed': client.parse_json_response(content),
+        }
+
+    result = client.chat(system_prompt, user_prompt)
+    result['parsed'] = None if result['error'] else client.parse_json_response(result['content'])
+    if result['parsed'] is not None:
+        try:
+            cache.set(key, result['content'], ttl)
+        except Exception as e:
+            logger.warning(f"Chat cache write failed: {e}")
+    return result
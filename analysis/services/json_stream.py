@@ -0,0 +1,88 @@
+"""analysis/services/json_stream.py - Inkrementalny parser tablicy JSON ze streamu OpenAI."""
+
+import logging
+
+from .openai_client import json_loads
+
+logger = logging.getLogger(__name__)
+
+
+class JsonArrayStream:
+    """Wyciąga kolejne obiekty z tablicy `key` w miarę napływania fragmentów JSON.
+
+    Odpowiedzi AI mają kilka KB, więc zamiast ijson wystarcza prosty skaner znaków
+    śledzący zagłębienie nawiasów i stringi. Każdy znak skanowany jest raz.
+
+    Użycie:
+        stream = JsonArrayStream('matches')
+        for delta in deltas:
+            for item in stream.feed(delta):
+                ...
+    """
+
+    def __init__(self, key):
+        self._marker = f'"{key}"'
+        self.reset()
+
+    def reset(self):
+        """Czyści stan — np. gdy request jest ponawiany (retry)."""
+        self._buf = ''
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+
+    def feed(self, text):
+        """Dokłada fragment odpowiedzi. Zwraca listę obiektów domkniętych w tym fragmencie."""
+        self._buf += text
+        items = []
+        if self._done:
+            return items
+
+        if not self._in_array:
+            idx = self._buf.find(self._marker)
+            if idx == -1:
+                return items
+            bracket = self._buf.find('[', idx + len(self._marker))
+            if bracket == -1:
+                return items
+            self._in_array = True
+            self._pos = bracket + 1
+
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 0:
+                    # Koniec tablicy `key`
+                    self._done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and buf[self._item_start] == '{':
+                    try:
+                        items.append(json_loads(buf[self._item_start:i + 1]))
+                    except ValueError as e:
+                        logger.debug(f"Skipping malformed streamed item: {e}")
+                    self._item_start = None
+            i += 1
+
+        self._pos = i
+        return items
@@ -2,43 +2,120 @@
 
 import json
 import logging
+import threading
 import time
+from functools import lru_cache
 from django.conf import settings
 
+from cvanalyzer.jsonutil import json_dumps, json_loads
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    import h2  # noqa: F401 — httpx obsluguje HTTP/2 tylko z pakietem h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+# Globalny limit rownoczesnych requestow do OpenAI w procesie. Pule watkow
+# (joby -> chunki -> fity -> sekcje) sa zagniezdzone, wiec ich rozmiary sie
+# mnoza — dopiero semafor wokol samego requestu trzyma AI_MAX_THREADS.
+AI_CALL_SLOTS = threading.BoundedSemaphore(getattr(settings, 'AI_MAX_THREADS', 5))
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def _shared_http_client():
+    """Wspolny per proces pool polaczen HTTP dla wszystkich instancji OpenAIClient.
+
+    Keep-alive: kolejne requesty (takze z nowych OpenAIClient()) nie placa za
+    TCP/TLS handshake. Tworzony leniwie — po forku workera Celery, nie przed.
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                import httpx
+                from openai import DefaultHttpxClient
+                _http_client = DefaultHttpxClient(
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(
+                        max_connections=20,
+                        max_keepalive_connections=10,
+                        keepalive_expiry=60,
+                    ),
+                )
+    return _http_client
+
+
+@lru_cache(maxsize=8)
+def _tiktoken_encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+
+
+def count_tokens(text, model):
+    """Liczba tokenow tekstu dla modelu.
+
+    Bez tiktoken (lub gdy nie zna modelu/nie ma slownika offline) — zachowawcze
+    oszacowanie ~3 znaki na token (zawyza wynik, wiec limity sa bezpieczne).
+    """
+    if tiktoken is not None:
+        try:
+            return len(_tiktoken_encoding(model).encode(text))
+        except Exception as e:
+            logger.debug(f"tiktoken unavailable for {model}: {e}")
+    return len(text) // 3 + 1
+
 
 class OpenAIClient:
     """Klient OpenAI z retry logic, rate limiting i śledzeniem tokenów."""
 
     def __init__(self):
         from openai import OpenAI
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=_shared_http_client(),
+        )
         self.model = settings.OPENAI_MODEL
         self.max_tokens = settings.OPENAI_MAX_TOKENS
         self.temperature = settings.OPENAI_TEMPERATURE
 
-    def chat(self, system_prompt, user_prompt, max_retries=3):
+    def chat(self, system_prompt, user_prompt, max_retries=3, on_delta=None):
         """Wysyła request do OpenAI Chat API z retry logic.
 
+        Args:
+            on_delta: opcjonalny callback — włącza streaming; wołany z każdym
+                fragmentem treści (str), a z None przed ponowieniem requestu
+                (sygnał, że dotychczasowe fragmenty są nieaktualne).
+
         Returns:
             dict z kluczami: 'content' (str), 'tokens_used' (int), 'error' (str|None)
         """
         for attempt in range(max_retries):
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                    response_format={"type": "json_object"},
-                )
-
-                content = response.choices[0].message.content
-                tokens = response.usage.total_tokens if response.usage else 0
+                if on_delta is not None and attempt:
+                    on_delta(None)
+                # Slot trzymany tylko na czas requestu — backoff (sleep) go zwalnia
+                with AI_CALL_SLOTS:
+                    if on_delta is not None:
+                        content, tokens = self._chat_stream(system_prompt, user_prompt, on_delta)
+                    else:
+                        response = self.client.chat.completions.create(
+                            **self._chat_body(system_prompt, user_prompt)
+                        )
+                        content = response.choices[0].message.content
+                        tokens = response.usage.total_tokens if response.usage else 0
 
                 return {
                     'content': content,
@@ -60,6 +137,103 @@ class OpenAIClient:
                         'error': str(e),
                     }
 
+    def _chat_stream(self, system_prompt, user_prompt, on_delta):
+        """Chat z stream=True — zwraca (content, tokens) po zamknięciu streamu."""
+        stream = self.client.chat.completions.create(
+            **self._chat_body(system_prompt, user_prompt),
+            stream=True,
+            stream_options={'include_usage': True},
+        )
+        parts = []
+        tokens = 0
+        for chunk in stream:
+            if chunk.usage:
+                tokens = chunk.usage.total_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        return ''.join(parts), tokens
+
+    def _chat_body(self, system_prompt, user_prompt):
+        """Parametry Chat Completions — wspolne dla chat() i Batch API."""
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature,
+            'response_format': {"type": "json_object"},
+        }
+
+    def submit_batch(self, requests):
+        """Wysyla zestaw requestow przez OpenAI Batch API (50% taniej, okno 24h).
+
+        Args:
+            requests: lista krotek (custom_id, system_prompt, user_prompt)
+
+        Returns:
+            batch_id (str)
+        """
+        lines = [
+            json_dumps({
+                'custom_id': custom_id,
+                'method': 'POST',
+                'url': BATCH_ENDPOINT,
+                'body': self._chat_body(system_prompt, user_prompt),
+            })
+            for custom_id, system_prompt, user_prompt in requests
+        ]
+        batch_file = self.client.files.create(
+            file=('batch.jsonl', '\n'.join(lines).encode('utf-8')),
+            purpose='batch',
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window='24h',
+        )
+        logger.info(f"OpenAI batch {batch.id} submitted ({len(lines)} requests)")
+        return batch.id
+
+    def retrieve_batch(self, batch_id):
+        """Sprawdza status batcha i pobiera wyniki gdy jest zakonczony.
+
+        Returns:
+            (status, results) — results to dict custom_id -> dict jak z chat()
+            ('content', 'tokens_used', 'error'); pusty dopoki status != 'completed'.
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        if batch.status != 'completed' or not batch.output_file_id:
+            return batch.status, results
+
+        output = self.client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            item = json_loads(line)
+            response = item.get('response') or {}
+            body = response.get('body') or {}
+            if item.get('error') or response.get('status_code') != 200:
+                error = item.get('error') or body.get('error') or 'Batch request failed'
+                results[item['custom_id']] = {
+                    'content': None,
+                    'tokens_used': 0,
+                    'error': str(error),
+                }
+                continue
+            results[item['custom_id']] = {
+                'content': body['choices'][0]['message']['content'],
+                'tokens_used': (body.get('usage') or {}).get('total_tokens', 0),
+                'error': None,
+            }
+        return batch.status, results
+
     def parse_json_response(self, content):
         """Parsuje odpowiedź JSON z OpenAI. Zwraca dict lub None.
 
@@ -79,7 +253,7 @@ class OpenAIClient:
                 cleaned = cleaned[:-3].rstrip()
 
         try:
-            return json.loads(cleaned)
+            return json_loads(cleaned)
         except json.JSONDecodeError:
             pass
 
@@ -88,7 +262,7 @@ class OpenAIClient:
         end = cleaned.rfind('}')
         if start != -1 and end > start:
             try:
-                return json.loads(cleaned[start:end + 1])
+                return json_loads(cleaned[start:end + 1])
             except json.JSONDecodeError:
                 pass
 
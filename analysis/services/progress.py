@@ -0,0 +1,46 @@
+"""analysis/services/progress.py - Postęp przetwarzania AI w Redis zamiast w DB.
+
+Pośrednie wartości progress (10/40/80%) to wyłącznie telemetria UI — nie
+wymagają trwałości, więc trafiają do cache (Redis, TTL 5 min) zamiast być
+osobnymi UPDATE w bazie. W DB zapisywany jest tylko stan końcowy.
+Endpointy pollingu czytają najpierw cache, potem pole `progress` z DB.
+"""
+
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TTL = 300
+
+
+def _key(fit_id):
+    return f'fit:{fit_id}:progress'
+
+
+def set_progress(fit_id, pct):
+    """Zapisuje postęp pojedynczego zadania."""
+    try:
+        cache.set(_key(fit_id), pct, PROGRESS_TTL)
+    except Exception as e:
+        logger.debug(f"Progress cache write failed for {fit_id}: {e}")
+
+
+def set_progress_many(fit_ids, pct):
+    """Zapisuje ten sam postęp dla wielu zadań jednym wywołaniem."""
+    if not fit_ids:
+        return
+    try:
+        cache.set_many({_key(fit_id): pct for fit_id in fit_ids}, PROGRESS_TTL)
+    except Exception as e:
+        logger.debug(f"Progress cache write failed: {e}")
+
+
+def get_progress(fit_id, default=None):
+    """Zwraca postęp z cache lub `default` (np. wartość z DB)."""
+    try:
+        return cache.get(_key(fit_id), default)
+    except Exception as e:
+        logger.debug(f"Progress cache read failed for {fit_id}: {e}")
+        return default
@@ -8,6 +8,7 @@ Usuwa: HTML, JS, base64, zero-width, stopki, powtórzenia. Skraca do max 4000 zn
 import logging
 import re
 import unicodedata
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -88,6 +89,17 @@ class TextCleaner:
 
         return text
 
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def clean_cached(text, max_length=4000):
+        """clean() z cache w procesie — ten sam tekst CV/sekcji czyszczony raz.
+
+        Przy matchingu jednego CV do wielu stanowisk clean() dostaje identyczny
+        tekst dla kazdej pary kandydat-stanowisko; wynik zalezy tylko od
+        (text, max_length), wiec kolejne wywolania sa trafieniami.
+        """
+        return TextCleaner.clean(text, max_length=max_length)
+
     @staticmethod
     def risk_level(flags):
         """
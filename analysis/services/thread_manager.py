@@ -1,33 +1,41 @@
-"""analysis/services/thread_manager.py - Thread limiter + watchdog wrapper.
+"""analysis/services/thread_manager.py - Wspólna pula wątków AI + diagnostyka.
 
-Ogranicza ilość równoczesnych wątków AI (semaphore)
+Ogranicza ilość równoczesnych zadań AI (ThreadPoolExecutor, MAX_THREADS
+wątków wielokrotnego użytku — nadmiarowe zadania czekają w kolejce puli)
 i monitoruje timeout (10 min).
 """
 
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
 
 logger = logging.getLogger(__name__)
 
-MAX_THREADS = 5
+# Wątki AI czekają głównie na I/O OpenAI (GIL zwolniony) — limit pilnuje rate limitów, nie CPU
+MAX_THREADS = getattr(settings, 'AI_MAX_THREADS', 5)
 THREAD_TIMEOUT = 600  # 10 min
 
-_semaphore = threading.Semaphore(MAX_THREADS)
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix='cvanalyzer')
 _active_threads = {}
 _lock = threading.Lock()
 
 
 def run_with_limit(target, args=(), kwargs=None, name=None):
-    """Uruchamia target w nowym wątku z ograniczeniem MAX_THREADS.
+    """Zleca target do wspólnej puli (maks. MAX_THREADS równocześnie).
 
-    - Czeka na wolny slot (semaphore)
+    - Czeka w kolejce puli na wolny wątek
     - Rejestruje wątek w _active_threads
-    - Po zakończeniu zwalnia slot
+    - Po zakończeniu zamyka połączenie DB wątku (wątki puli są reużywane)
+
+    Returns:
+        concurrent.futures.Future
     """
     kwargs = kwargs or {}
 
     def wrapper():
-        _semaphore.acquire()
         thread_id = threading.current_thread().ident
         with _lock:
             _active_threads[thread_id] = {
@@ -41,11 +49,9 @@ def run_with_limit(target, args=(), kwargs=None, name=None):
         finally:
             with _lock:
                 _active_threads.pop(thread_id, None)
-            _semaphore.release()
+            connection.close()
 
-    thread = threading.Thread(target=wrapper, daemon=True)
-    thread.start()
-    return thread
+    return EXECUTOR.submit(wrapper)
 
 
 def get_active_count():
@@ -1,11 +1,14 @@
-"""analysis/tasks.py - Uruchamianie analizy CV w tle (threading.Thread).
+"""analysis/tasks.py - Uruchamianie analizy CV w tle (pula wątków).
 
-Bez Celery - używa threading.Thread + semaphore (MAX_THREADS=5)
-do uruchomienia analizy poza requestem.
+Widoki używają wspólnej puli thread_manager (MAX_THREADS = settings.AI_MAX_THREADS)
+do uruchomienia analizy poza requestem. Wyjątek (Celery): run_analysis_task —
+analiza zlecana z innego zadania Celery (upload w rekrutacji).
 """
 
 import logging
 
+from celery import shared_task
+
 from analysis.services.thread_manager import run_with_limit
 
 logger = logging.getLogger(__name__)
@@ -20,6 +23,12 @@ def run_analysis_in_thread(analysis_id):
     )
 
 
+@shared_task
+def run_analysis_task(analysis_id):
+    """Analiza CV jako osobne zadanie Celery (zamiast wątku puli w procesie workera)."""
+    _run_analysis(analysis_id)
+
+
 def _run_analysis(analysis_id):
     """Wrapper dla CVAnalyzer.run_analysis z obsługą błędów."""
     from analysis.services.analyzer import CVAnalyzer
@@ -0,0 +1,79 @@
+"""analysis/tests/test_json_stream.py — Testy inkrementalnego parsera JsonArrayStream.
+
+Uruchomienie:
+    python manage.py test analysis.tests.test_json_stream --verbosity=2
+
+Testy NIE korzystają z bazy danych ani z OpenAI API.
+"""
+
+import json
+
+from django.test import SimpleTestCase
+
+from analysis.services.json_stream import JsonArrayStream
+
+
+MATCHES = [
+    {'position_id': 'a', 'scores': {'overall_match': 80}, 'matching_skills': ['Python', 'SQL']},
+    {'position_id': 'b', 'scores': {'overall_match': 40}, 'missing_skills': []},
+    {'position_id': 'c', 'note': 'brace } and bracket ] and "quote" inside'},
+]
+RESPONSE = json.dumps({'matches': MATCHES, 'summary': {'count': 3}})
+
+
+def _feed_in_chunks(stream, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(stream.feed(text[i:i + size]))
+    return items
+
+
+class JsonArrayStreamTest(SimpleTestCase):
+
+    def test_whole_response_in_one_fragment(self):
+        self.assertEqual(JsonArrayStream('matches').feed(RESPONSE), MATCHES)
+
+    def test_every_chunk_size_gives_same_items(self):
+        for size in (1, 2, 3, 7, 16, 64):
+            with self.subTest(size=size):
+                self.assertEqual(_feed_in_chunks(JsonArrayStream('matches'), RESPONSE, size), MATCHES)
+
+    def test_items_are_returned_as_soon_as_closed(self):
+        stream = JsonArrayStream('matches')
+        first = json.dumps(MATCHES[0])
+        self.assertEqual(stream.feed('{"matches": [' + first[:-1]), [])
+        self.assertEqual(stream.feed('}, {"position_id"'), [MATCHES[0]])
+
+    def test_marker_split_across_fragments(self):
+        stream = JsonArrayStream('matches')
+        self.assertEqual(stream.feed('{"mat'), [])
+        self.assertEqual(stream.feed('ches" :\n ['), [])
+        self.assertEqual(stream.feed('{"position_id": "x"}]}'), [{'position_id': 'x'}])
+
+    def test_escaped_quotes_in_strings(self):
+        item = {'explanation': 'says \\"hi\\" and {not a brace}'}
+        self.assertEqual(JsonArrayStream('matches').feed(json.dumps({'matches': [item]})), [item])
+
+    def test_stops_at_end_of_array(self):
+        stream = JsonArrayStream('matches')
+        text = '{"matches": [{"a": 1}], "other": [{"b": 2}]}'
+        self.assertEqual(stream.feed(text), [{'a': 1}])
+        self.assertEqual(stream.feed('{"c": 3}'), [])
+
+    def test_other_keys_before_marker_are_ignored(self):
+        text = '{"meta": [{"x": 1}], "matches": [{"a": 1}]}'
+        self.assertEqual(JsonArrayStream('matches').feed(text), [{'a': 1}])
+
+    def test_non_object_elements_are_skipped(self):
+        text = '{"matches": [[1, 2], {"a": 1}]}'
+        self.assertEqual(JsonArrayStream('matches').feed(text), [{'a': 1}])
+
+    def test_malformed_item_is_skipped(self):
+        text = '{"matches": [{"a": 1,}, {"b": 2}]}'
+        self.assertEqual(JsonArrayStream('matches').feed(text), [{'b': 2}])
+
+    def test_reset_discards_partial_state(self):
+        stream = JsonArrayStream('matches')
+        stream.feed('{"matches": [{"position_id": "a", "sc')
+        stream.reset()
+        self.assertEqual(stream.feed(RESPONSE), MATCHES)
@@ -27,13 +27,15 @@ def invalidate_history_cache(user_id):
     cache.delete_many([_history_cache_key(user_id, p) for p in range(1, _HISTORY_MAX_PAGES)])
 
 
-def start_cv_analysis(cv_doc, user, language='en'):
+def start_cv_analysis(cv_doc, user, language='en', run=run_analysis_in_thread):
     """Uruchamia analizę CV z cache + billing.
 
     Args:
         cv_doc: CVDocument instance (must have extracted_text)
         user: User instance
         language: ISO language code ('en', 'pl') — AI will respond in this language
+        run: uruchamia analizę po id (str) — domyślnie wątek z puli;
+            zadania Celery przekazują run_analysis_task.delay
 
     Returns:
         (analysis, status) where:
@@ -61,5 +63,5 @@ def start_cv_analysis(cv_doc, user, language='en'):
         raw_ai_response={'_lang': lang},
     )
     invalidate_history_cache(user.id)
-    run_analysis_in_thread(str(analysis.id))
+    run(str(analysis.id))
     return analysis, 'started'
@@ -11,6 +11,58 @@ cv/services/section_detector.py - Inteligentny detektor sekcji CV.
 
 import re
 import unicodedata
+from functools import lru_cache
+
+# Wzorce kompilowane raz przy imporcie (nie przy każdej linii / każdym CV)
+_HEADING_PREFIX_RE = re.compile(r'^[\d\.\-\*\#\>\|:]+\s*')
+_SENTENCE_PUNCT_RE = re.compile(r'[.,;:!?\(\)\[\]{}]')
+_WORD_GAP_RE = re.compile(r' {2,}')
+
+_DATE_RE = re.compile(
+    r'(19|20)\d{2}'             # rok
+    r'(\s*[-–—/]\s*'            # separator
+    r'((19|20)\d{2}|'           # rok końcowy
+    r'obecnie|present|current|teraz|nadal'  # lub "obecnie"
+    r'))?',
+    re.IGNORECASE,
+)
+_SKILL_SPLIT_RE = re.compile(r'[,;/|\s]+')
+_TECH_KEYWORDS = frozenset({
+    'python', 'java', 'javascript', 'sql', 'excel', 'word',
+    'powerpoint', 'sap', 'wms', 'power bi', 'tableau', 'react',
+    'angular', 'django', 'flask', 'docker', 'kubernetes', 'aws',
+    'azure', 'git', 'linux', 'windows', 'html', 'css', 'c++',
+    'c#', '.net', 'php', 'ruby', 'swift', 'kotlin', 'node',
+    'typescript', 'mongodb', 'postgresql', 'mysql', 'redis',
+    'photoshop', 'illustrator', 'figma', 'autocad', 'matlab',
+    'r', 'scala', 'go', 'rust', 'terraform', 'jenkins',
+})
+# Email | telefon | URL jedną alternatywą — jeden przebieg po linii zamiast trzech
+_CONTACT_RE = re.compile(
+    r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+    r'|[\+]?[\d\s\-\(\)]{7,15}'
+    r'|(?i:linkedin|github|http|www\.)'
+)
+_LANGUAGE_RE = re.compile(
+    r'(angielski|english|niemiecki|german|francuski|french|'
+    r'hiszpanski|hiszpański|spanish|wloski|włoski|italian|'
+    r'rosyjski|russian|polski|polish|chiński|chinese|'
+    r'japoński|japanese|koreański|korean|'
+    r'portugalski|portuguese|arabski|arabic|'
+    r'ukraiński|ukrainian|czeski|czech|'
+    r'native|fluent|advanced|intermediate|basic|'
+    r'ojczysty|biegły|biegly|zaawansowany|średniozaawansowany|podstawowy|'
+    r'[abc][12]|c1|c2|b1|b2|a1|a2)',
+    re.IGNORECASE,
+)
+_EDUCATION_RE = re.compile(
+    r'(uniwersytet|university|politechnika|academy|'
+    r'liceum|technikum|szkoła|szkola|school|college|'
+    r'studia|bachelor|master|magister|inżynier|inzynier|'
+    r'licencjat|doktor|phd|mba|'
+    r'wydział|wydzial|faculty|institute|instytut)',
+    re.IGNORECASE,
+)
 
 
 class SectionDetector:
@@ -115,7 +167,7 @@ class SectionDetector:
             return False
 
         # Nie zawiera interpunkcji typowej dla zdań
-        if re.search(r'[.,;:!?\(\)\[\]{}]', line):
+        if _SENTENCE_PUNCT_RE.search(line):
             return False
 
         # Usuń spacje i policz
@@ -181,7 +233,7 @@ class SectionDetector:
         Gdy brak podwójnej spacji, próbuje rozdzielić wg znanych słów.
         """
         # Podwójna+ spacja = granica słowa
-        parts = re.split(r' {2,}', line.strip())
+        parts = _WORD_GAP_RE.split(line.strip())
 
         if len(parts) > 1:
             # Są wyraźne granice słów
@@ -209,12 +261,7 @@ class SectionDetector:
         """Próbuje rozdzielić 'CELZAWODOWY' → ['CEL', 'ZAWODOWY'] wg słownika."""
         blob_lower = SectionDetector._strip_diacritics(blob.lower())
 
-        known = SectionDetector._KNOWN_WORDS
-        known_normalized = [
-            (SectionDetector._strip_diacritics(w.lower()), w) for w in known
-        ]
-        # Sortuj od najdłuższych (greedy match)
-        known_normalized.sort(key=lambda x: -len(x[0]))
+        known_normalized = SectionDetector._known_words_normalized()
 
         result = []
         remaining = blob_lower
@@ -237,10 +284,43 @@ class SectionDetector:
 
         return result if len(result) > 1 else None
 
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _known_words_normalized():
+        """_KNOWN_WORDS bez diakrytyków, od najdłuższych (greedy match) — liczone raz."""
+        known_normalized = [
+            (SectionDetector._strip_diacritics(w.lower()), w)
+            for w in SectionDetector._KNOWN_WORDS
+        ]
+        known_normalized.sort(key=lambda x: -len(x[0]))
+        return tuple(known_normalized)
+
     # ---------------------------------------------------------------
     # ETAP 2+3: Wykrywanie nagłówków sekcji
     # ---------------------------------------------------------------
 
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _keyword_table():
+        """SECTION_KEYWORDS spłaszczone do (section_type, kw, kw bez diakrytyków).
+
+        Kolejność jak w słowniku (decyduje o priorytecie przy remisach).
+        """
+        return tuple(
+            (section_type, kw, SectionDetector._strip_diacritics(kw))
+            for section_type, keywords in SectionDetector.SECTION_KEYWORDS.items()
+            for kw in keywords
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _exact_keywords():
+        """keyword -> section_type (pierwszy typ w kolejności słownika) do exact match."""
+        exact = {}
+        for section_type, kw, _ in SectionDetector._keyword_table():
+            exact.setdefault(kw, section_type)
+        return exact
+
     @staticmethod
     def _strip_diacritics(text):
         """Usuwa polskie znaki diakrytyczne do porównania."""
@@ -248,10 +328,16 @@ class SectionDetector:
         return ''.join(c for c in nfkd if unicodedata.category(c) != 'Mn')
 
     @staticmethod
-    def _levenshtein(s1, s2):
-        """Odległość Levenshteina — proste DP."""
+    def _levenshtein(s1, s2, max_dist=None):
+        """Odległość Levenshteina — proste DP.
+
+        Z max_dist liczenie kończy się, gdy wynik na pewno go przekroczy
+        (różnica długości albo cały wiersz DP > max_dist) — zwraca wtedy max_dist + 1.
+        """
         if len(s1) < len(s2):
-            return SectionDetector._levenshtein(s2, s1)
+            return SectionDetector._levenshtein(s2, s1, max_dist)
+        if max_dist is not None and len(s1) - len(s2) > max_dist:
+            return max_dist + 1
         if len(s2) == 0:
             return len(s1)
 
@@ -265,11 +351,14 @@ class SectionDetector:
                     prev_row[j + 1] + 1,   # delete
                     prev_row[j] + cost,     # replace
                 ))
+            if max_dist is not None and min(curr_row) > max_dist:
+                return max_dist + 1
             prev_row = curr_row
 
         return prev_row[-1]
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def classify_heading(heading):
         """Klasyfikuje nagłówek do typu sekcji.
 
@@ -277,10 +366,13 @@ class SectionDetector:
         1. Exact match (case-insensitive)
         2. Contains match
         3. Fuzzy match (Levenshtein ≤ 2) z ignorowaniem polskich znaków
+
+        Wynik zależy tylko od tekstu, więc jest cache'owany — te same krótkie
+        linie wracają w kolejnych CV i w classify_multi_headers.
         """
         heading_lower = heading.lower().strip()
         # Usuń numerację i znaki specjalne na początku
-        heading_clean = re.sub(r'^[\d\.\-\*\#\>\|:]+\s*', '', heading_lower)
+        heading_clean = _HEADING_PREFIX_RE.sub('', heading_lower)
         heading_clean = heading_clean.strip()
 
         if not heading_clean or len(heading_clean) < 3:
@@ -288,30 +380,29 @@ class SectionDetector:
 
         heading_no_diacritics = SectionDetector._strip_diacritics(heading_clean)
 
-        # 1. Exact match
-        for section_type, keywords in SectionDetector.SECTION_KEYWORDS.items():
-            for kw in keywords:
-                if heading_clean == kw:
-                    return section_type
+        keyword_table = SectionDetector._keyword_table()
+
+        # 1. Exact match (1 lookup zamiast przejścia po wszystkich keywordach)
+        section_type = SectionDetector._exact_keywords().get(heading_clean)
+        if section_type:
+            return section_type
 
         # 2. Contains match (heading zawiera keyword lub keyword zawiera heading)
-        for section_type, keywords in SectionDetector.SECTION_KEYWORDS.items():
-            for kw in keywords:
-                if kw in heading_clean or heading_clean in kw:
-                    return section_type
+        for section_type, kw, _ in keyword_table:
+            if kw in heading_clean or heading_clean in kw:
+                return section_type
 
         # 3. Fuzzy match: Levenshtein ≤ 2 (ignorując diakrytyki)
         best_match = None
         best_dist = 3  # max dopuszczalna odległość + 1
-        for section_type, keywords in SectionDetector.SECTION_KEYWORDS.items():
-            for kw in keywords:
-                kw_no_diacritics = SectionDetector._strip_diacritics(kw)
-                dist = SectionDetector._levenshtein(
-                    heading_no_diacritics, kw_no_diacritics,
-                )
-                if dist < best_dist:
-                    best_dist = dist
-                    best_match = section_type
+        for section_type, _, kw_no_diacritics in keyword_table:
+            # Liczy tylko do best_dist - 1 — dalsze odległości i tak nie wygrają
+            dist = SectionDetector._levenshtein(
+                heading_no_diacritics, kw_no_diacritics, max_dist=best_dist - 1,
+            )
+            if dist < best_dist:
+                best_dist = dist
+                best_match = section_type
 
         if best_match and best_dist <= 2:
             return best_match
@@ -390,20 +481,12 @@ class SectionDetector:
     @staticmethod
     def _detect_experience_block(lines):
         """Wykrywa blok doświadczenia po wzorcach dat."""
-        date_pattern = re.compile(
-            r'(19|20)\d{2}'             # rok
-            r'(\s*[-–—/]\s*'            # separator
-            r'((19|20)\d{2}|'           # rok końcowy
-            r'obecnie|present|current|teraz|nadal'  # lub "obecnie"
-            r'))?',
-            re.IGNORECASE,
-        )
         blocks = []
         current_block_start = None
 
         for i, line in enumerate(lines):
             stripped = line.strip()
-            if date_pattern.search(stripped):
+            if _DATE_RE.search(stripped):
                 if current_block_start is None:
                     current_block_start = max(0, i - 1)
             else:
@@ -419,24 +502,14 @@ class SectionDetector:
     @staticmethod
     def _detect_skills_block(lines):
         """Wykrywa blok umiejętności po koncentracji krótkich linii/buzzwordów."""
-        tech_keywords = {
-            'python', 'java', 'javascript', 'sql', 'excel', 'word',
-            'powerpoint', 'sap', 'wms', 'power bi', 'tableau', 'react',
-            'angular', 'django', 'flask', 'docker', 'kubernetes', 'aws',
-            'azure', 'git', 'linux', 'windows', 'html', 'css', 'c++',
-            'c#', '.net', 'php', 'ruby', 'swift', 'kotlin', 'node',
-            'typescript', 'mongodb', 'postgresql', 'mysql', 'redis',
-            'photoshop', 'illustrator', 'figma', 'autocad', 'matlab',
-            'r', 'scala', 'go', 'rust', 'terraform', 'jenkins',
-        }
         blocks = []
         current_block_start = None
         consecutive_matches = 0
 
         for i, line in enumerate(lines):
             stripped = line.strip().lower()
-            words = re.split(r'[,;/|\s]+', stripped)
-            match_count = sum(1 for w in words if w in tech_keywords)
+            words = _SKILL_SPLIT_RE.split(stripped)
+            match_count = sum(1 for w in words if w in _TECH_KEYWORDS)
 
             if match_count >= 1 or (len(stripped) < 30 and len(words) <= 3 and stripped):
                 if current_block_start is None:
@@ -456,15 +529,9 @@ class SectionDetector:
     @staticmethod
     def _detect_contact_block(lines):
         """Wykrywa blok kontaktowy po email, telefon, adres."""
-        email_re = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
-        phone_re = re.compile(r'[\+]?[\d\s\-\(\)]{7,15}')
-        url_re = re.compile(r'(linkedin|github|http|www\.)', re.IGNORECASE)
-
-        contact_lines = []
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-            if email_re.search(stripped) or phone_re.search(stripped) or url_re.search(stripped):
-                contact_lines.append(i)
+        contact_lines = [
+            i for i, line in enumerate(lines) if _CONTACT_RE.search(line.strip())
+        ]
 
         if not contact_lines:
             return []
@@ -485,23 +552,9 @@ class SectionDetector:
     @staticmethod
     def _detect_language_block(lines):
         """Wykrywa blok języków po wzorcach typu 'angielski - B2'."""
-        lang_patterns = re.compile(
-            r'(angielski|english|niemiecki|german|francuski|french|'
-            r'hiszpanski|hiszpański|spanish|wloski|włoski|italian|'
-            r'rosyjski|russian|polski|polish|chiński|chinese|'
-            r'japoński|japanese|koreański|korean|'
-            r'portugalski|portuguese|arabski|arabic|'
-            r'ukraiński|ukrainian|czeski|czech|'
-            r'native|fluent|advanced|intermediate|basic|'
-            r'ojczysty|biegły|biegly|zaawansowany|średniozaawansowany|podstawowy|'
-            r'[abc][12]|c1|c2|b1|b2|a1|a2)',
-            re.IGNORECASE,
-        )
-
-        lang_lines = []
-        for i, line in enumerate(lines):
-            if lang_patterns.search(line.strip()):
-                lang_lines.append(i)
+        lang_lines = [
+            i for i, line in enumerate(lines) if _LANGUAGE_RE.search(line.strip())
+        ]
 
         if len(lang_lines) < 2:
             return []
@@ -522,19 +575,9 @@ class SectionDetector:
     @staticmethod
     def _detect_education_block(lines):
         """Wykrywa blok edukacji po wzorcach szkół/uczelni."""
-        edu_patterns = re.compile(
-            r'(uniwersytet|university|politechnika|academy|'
-            r'liceum|technikum|szkoła|szkola|school|college|'
-            r'studia|bachelor|master|magister|inżynier|inzynier|'
-            r'licencjat|doktor|phd|mba|'
-            r'wydział|wydzial|faculty|institute|instytut)',
-            re.IGNORECASE,
-        )
-
-        edu_lines = []
-        for i, line in enumerate(lines):
-            if edu_patterns.search(line.strip()):
-                edu_lines.append(i)
+        edu_lines = [
+            i for i, line in enumerate(lines) if _EDUCATION_RE.search(line.strip())
+        ]
 
         if not edu_lines:
             return []
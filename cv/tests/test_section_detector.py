@@ -0,0 +1,99 @@
+"""cv/tests/test_section_detector.py — Levenshtein with early exit vs the full DP.
+
+Tests cover:
+    1.  _levenshtein(max_dist) == min(full distance, max_dist + 1) for all pairs
+    2.  _levenshtein without max_dist == full distance
+    3.  classify_heading gives the same results as with the full (old) DP
+    4.  Fuzzy matches for typical OCR / typo headings
+
+Run:
+    python manage.py test cv.tests.test_section_detector --verbosity=2
+"""
+
+import itertools
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from cv.services.section_detector import SectionDetector
+
+
+def _levenshtein_full(s1, s2):
+    """Reference: full DP without early exit (implementation before the optimisation)."""
+    prev_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        curr_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            curr_row.append(min(
+                curr_row[j] + 1,
+                prev_row[j + 1] + 1,
+                prev_row[j] + (c1 != c2),
+            ))
+        prev_row = curr_row
+    return prev_row[-1]
+
+
+WORDS = [
+    '', 'a', 'ab', 'ba', 'abc', 'kitten', 'sitting', 'skills', 'skils', 'skillz',
+    'experience', 'experiance', 'expirience', 'education', 'edukacja', 'edukacya',
+    'jezyki', 'languages', 'hobby', 'hobbies', 'profil', 'profile', 'summary',
+]
+
+HEADINGS = [
+    'Experience', 'Experiance', 'EXPIRIENCE', 'Work history', 'Doświadczenie', 'Doswiadczenie',
+    'Doświadczenie zawodowe', 'Education', 'Edukacja', 'edukacya', 'Wykształcenie', 'Skills',
+    'Skils', 'Umiejętności', 'Umiejetnosci', 'Languages', 'Języki', 'językki', 'Hobby', 'Hobbys',
+    'Zainteresowania', 'Interests', 'Summary', 'about', 'profesional', 'Certyfikaty',
+    'Projects', 'Projekty', 'References', '1. Experience', '- Skills -', 'xx', 'Lorem ipsum',
+    'Jan Kowalski', 'Python developer', 'ACME 2019-2023',
+]
+
+
+class LevenshteinEarlyExitTest(SimpleTestCase):
+
+    def test_bounded_distance_matches_full_dp(self):
+        for s1, s2 in itertools.product(WORDS, repeat=2):
+            full = _levenshtein_full(s1, s2)
+            for max_dist in range(4):
+                with self.subTest(s1=s1, s2=s2, max_dist=max_dist):
+                    self.assertEqual(
+                        SectionDetector._levenshtein(s1, s2, max_dist=max_dist),
+                        min(full, max_dist + 1),
+                    )
+
+    def test_unbounded_distance_matches_full_dp(self):
+        for s1, s2 in itertools.product(WORDS, repeat=2):
+            with self.subTest(s1=s1, s2=s2):
+                self.assertEqual(SectionDetector._levenshtein(s1, s2), _levenshtein_full(s1, s2))
+
+    def test_length_difference_exits_early(self):
+        self.assertEqual(SectionDetector._levenshtein('a', 'abcdefgh', max_dist=2), 3)
+
+
+class ClassifyHeadingTest(SimpleTestCase):
+
+    def setUp(self):
+        SectionDetector.classify_heading.cache_clear()
+        self.addCleanup(SectionDetector.classify_heading.cache_clear)
+
+    def _classify_all(self):
+        SectionDetector.classify_heading.cache_clear()
+        return {heading: SectionDetector.classify_heading(heading) for heading in HEADINGS}
+
+    def test_same_results_as_full_dp(self):
+        new = self._classify_all()
+        with patch.object(
+            SectionDetector, '_levenshtein',
+            staticmethod(lambda s1, s2, max_dist=None: _levenshtein_full(s1, s2)),
+        ):
+            old = self._classify_all()
+        self.assertEqual(new, old)
+
+    def test_fuzzy_headings(self):
+        self.assertEqual(SectionDetector.classify_heading('Experiance'), 'experience')
+        self.assertEqual(SectionDetector.classify_heading('Skils'), 'skills')
+        self.assertEqual(SectionDetector.classify_heading('edukacya'), 'education')
+
+    def test_too_short_or_unknown(self):
+        self.assertIsNone(SectionDetector.classify_heading('xx'))
+        self.assertIsNone(SectionDetector.classify_heading('Lorem ipsum'))
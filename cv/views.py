@@ -111,8 +111,9 @@ def _process_uploaded_cv(uploaded_file, user):
     )
 
     sections = SectionDetector.detect_sections(result['text'])
-    for s in sections:
-        CVSection.objects.create(
+    # Sekcje jednym INSERT-em
+    CVSection.objects.bulk_create([
+        CVSection(
             document=cv_doc,
             section_type=s['type'],
             title=s['title'],
@@ -121,6 +122,8 @@ def _process_uploaded_cv(uploaded_file, user):
             end_position=s['end'],
             order=s['order'],
         )
+        for s in sections
+    ], batch_size=500)
 
     return cv_doc
 
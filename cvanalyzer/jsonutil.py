@@ -0,0 +1,25 @@
+"""cvanalyzer/jsonutil.py - Szybka serializacja JSON (orjson z fallbackiem na stdlib).
+
+Bez zaleznosci od Django i klienta OpenAI — importowane przez modele i serwisy.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    """Parsuje JSON przez orjson (2-5x szybszy), fallback na stdlib json."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """Serializuje do kompaktowego JSON (str) przez orjson, fallback na stdlib json."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
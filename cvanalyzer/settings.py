@@ -107,6 +107,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'cvanalyzer.wsgi.application'
+# WebSockety (status raportow PDF) — wymaga serwera ASGI, np. daphne cvanalyzer.asgi:application
+ASGI_APPLICATION = 'cvanalyzer.asgi.application'
 
 # ---------------------------------------------------------------------------
 # Baza danych - PostgreSQL via DATABASE_URL
@@ -318,6 +320,12 @@ OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY', '')
 OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')
 OPENAI_MAX_TOKENS = 2048
 OPENAI_TEMPERATURE = 0
+# Okno kontekstu modelu (tokeny) — prompty batch matchingu dzielone, gdy go przekraczaja
+OPENAI_CONTEXT_TOKENS = int(os.environ.get('OPENAI_CONTEXT_TOKENS', '128000'))
+# "Match all" dla >= N stanowisk idzie przez OpenAI Batch API (50% taniej, do 24h). 0 = wylaczone.
+OPENAI_BATCH_MATCH_THRESHOLD = int(os.environ.get('OPENAI_BATCH_MATCH_THRESHOLD', '0'))
+# Limit rownoleglych watkow AI w tle (analysis/services/thread_manager.py) na proces
+AI_MAX_THREADS = int(os.environ.get('AI_MAX_THREADS', '5'))
 
 # ---------------------------------------------------------------------------
 # Celery + Redis
@@ -334,12 +342,35 @@ CACHES = {
     }
 }
 
+# Channels — worker Celery wysyla przez Redis status raportu do WebSocketow
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {'hosts': [REDIS_URL]},
+    }
+}
+
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL)
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', REDIS_URL)
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Warsaw'
+# Zadania AI trwaja dlugo i nierowno — worker bierze 1 zadanie naraz (jak -Ofair
+# --prefetch-multiplier=1), zeby krotkie zadania nie czekaly za dlugimi
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Nie uzywamy rate_limit na zadaniach — worker nie musi prowadzic kubelkow limitow
+CELERY_WORKER_DISABLE_RATE_LIMITS = True
+
+# Osobna kolejka dla generowania PDF, zeby raporty nie czekaly za analizami AI.
+# Worker: celery -A cvanalyzer worker -Q pdf_reports -c 16 (zadania czekaja
+# glownie na DB/storage — concurrency moze byc wieksze niz liczba CPU).
+# Pusta wartosc = domyslna kolejka; ustawiamy dopiero gdy taki worker dziala.
+PDF_REPORTS_QUEUE = os.environ.get('PDF_REPORTS_QUEUE', '')
+CELERY_TASK_ROUTES = (
+    {'reports.tasks.generate_pdf_report_task': {'queue': PDF_REPORTS_QUEUE}}
+    if PDF_REPORTS_QUEUE else {}
+)
 
 # Celery Beat - zaplanowane zadania cykliczne (opcjonalne, wymaga Redis)
 try:
@@ -349,6 +380,14 @@ try:
             'task': 'billing.tasks.reset_monthly_usage',
             'schedule': crontab(day_of_month='1', hour='0', minute='0'),
         },
+        'poll-match-batches': {
+            'task': 'recruitment.tasks.poll_match_batches',
+            'schedule': crontab(minute='*/5'),
+        },
+        'prune-extraction-cache': {
+            'task': 'recruitment.tasks.prune_extraction_cache_task',
+            'schedule': crontab(hour='3', minute='30'),
+        },
     }
 except ImportError:
     CELERY_BEAT_SCHEDULE = {}
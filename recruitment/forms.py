@@ -119,6 +119,13 @@ class CVUploadForm(forms.Form):
 
     def clean(self):
         cleaned_data = super().clean()
-        if not cleaned_data.get('single_cv') and not cleaned_data.get('multiple_cvs'):
+        # Jedna lista plikow do przetworzenia (single + multiple) — widok nie
+        # siega juz drugi raz do request.FILES
+        files = []
+        if cleaned_data.get('single_cv'):
+            files.append(cleaned_data['single_cv'])
+        files.extend(f for f in (cleaned_data.get('multiple_cvs') or []) if f)
+        if not files:
             raise forms.ValidationError('Upload at least one CV file.')
+        cleaned_data['files'] = files
         return cleaned_data
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-15 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruitment', '0006_candidateintelligence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobfitresult',
+            name='batch_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='jobfitresult',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('queued', 'Queued (Batch API)'), ('processing', 'Processing'), ('done', 'Done'), ('partial', 'Partial Results'), ('pending_ai', 'Pending AI'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
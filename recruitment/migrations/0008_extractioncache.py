@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-15 22:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv', '0004_cvdocument_injection_fields'),
+        ('recruitment', '0007_jobfitresult_batch_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=64)),
+                ('raw_extraction', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('cv_document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extraction_cache', to='cv.cvdocument')),
+            ],
+            options={
+                'db_table': 'recruitment_extraction_cache',
+                'constraints': [models.UniqueConstraint(fields=('cv_document', 'key'), name='extraction_cache_document_key')],
+            },
+        ),
+    ]
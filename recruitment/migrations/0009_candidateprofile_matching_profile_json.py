@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-15 22:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruitment', '0008_extractioncache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidateprofile',
+            name='matching_profile_json',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruitment', '0009_candidateprofile_matching_profile_json'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobfitresult',
+            name='batch_requirements',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobfitresult',
+            name='batch_stage',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
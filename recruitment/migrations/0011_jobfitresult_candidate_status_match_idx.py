@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruitment', '0010_jobfitresult_batch_stage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobfitresult',
+            index=models.Index(fields=['candidate', 'status', 'overall_match'], name='fit_candidate_status_match_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruitment', '0011_jobfitresult_candidate_status_match_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobfitresult',
+            index=models.Index(fields=['user', 'status'], name='fit_user_status_idx'),
+        ),
+    ]
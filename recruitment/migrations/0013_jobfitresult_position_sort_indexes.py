@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruitment', '0012_jobfitresult_user_status_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobfitresult',
+            index=models.Index(condition=models.Q(('status', 'done')), fields=['position', '-overall_match'], name='fit_pos_done_overall_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobfitresult',
+            index=models.Index(condition=models.Q(('status', 'done')), fields=['position', '-skill_match'], name='fit_pos_done_skill_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobfitresult',
+            index=models.Index(condition=models.Q(('status', 'done')), fields=['position', '-experience_match'], name='fit_pos_done_exp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobfitresult',
+            index=models.Index(condition=models.Q(('status', 'done')), fields=['position', '-seniority_match'], name='fit_pos_done_seniority_idx'),
+        ),
+    ]
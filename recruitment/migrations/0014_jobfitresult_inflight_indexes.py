@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recruitment', '0013_jobfitresult_position_sort_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobfitresult',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'processing', 'pending_ai', 'queued'])), fields=['user'], name='fit_user_inflight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobfitresult',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'processing', 'pending_ai', 'queued'])), fields=['candidate'], name='fit_candidate_inflight_idx'),
+        ),
+    ]
@@ -4,6 +4,8 @@ import uuid
 from django.db import models
 from django.conf import settings
 
+from cvanalyzer.jsonutil import json_dumps
+
 
 class JobPosition(models.Model):
     """Stanowisko rekrutacyjne z wymaganiami."""
@@ -74,6 +76,12 @@ class CandidateProfile(models.Model):
 
     SENIORITY_CHOICES = JobPosition.SENIORITY_CHOICES
 
+    # Pola wchodzace do profilu w promptach matchingu (matching_profile_json)
+    MATCHING_FIELDS = (
+        'name', 'current_role', 'years_of_experience', 'seniority_level',
+        'skills', 'skill_levels', 'education', 'companies', 'languages',
+    )
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
@@ -111,6 +119,9 @@ class CandidateProfile(models.Model):
     # Raw AI response
     raw_extraction = models.JSONField(default=dict, blank=True)
 
+    # Profil zserializowany raz na potrzeby promptow matchingu — odswiezany w save()
+    matching_profile_json = models.TextField(blank=True, default='')
+
     # Status
     status = models.CharField(max_length=20, default='pending', choices=[
         ('pending', 'Pending'),
@@ -133,12 +144,71 @@ class CandidateProfile(models.Model):
     def __str__(self):
         return self.name or f"Candidate {str(self.id)[:8]}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.MATCHING_FIELDS):
+            self.matching_profile_json = self.build_matching_profile_json()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'matching_profile_json'}
+        super().save(*args, **kwargs)
+
+    def build_matching_profile_json(self):
+        # Kompaktowy JSON (bez wciec) — profil trafia do kazdego promptu matchingu
+        return json_dumps({
+            'name': self.name,
+            'current_role': self.current_role,
+            'years_of_experience': self.years_of_experience,
+            'seniority_level': self.seniority_level,
+            'skills': self.skills,
+            'skill_levels': self.skill_levels,
+            'education': self.education,
+            'companies': self.companies[:5],
+            'languages': self.languages,
+        })
+
+    def get_matching_profile_json(self):
+        """Zapisany profil JSON; dla profili sprzed migracji liczony w locie."""
+        return self.matching_profile_json or self.build_matching_profile_json()
+
+
+class ExtractionCache(models.Model):
+    """Cache odpowiedzi AI z ekstrakcji profilu — klucz = sha256(model + prompt z tekstem CV).
+
+    Ten sam tekst CV (re-upload, reprocessing) nie wymaga ponownego wywolania OpenAI.
+    Wpis nalezy do dokumentu CV (usuwany razem z nim lub z kontem), a odczyt jest
+    ograniczony do CV tego samego uzytkownika. Wpisy wygasaja po EXTRACTION_CACHE_TTL
+    (services/profile_extractor.py).
+    """
+
+    cv_document = models.ForeignKey(
+        'cv.CVDocument', on_delete=models.CASCADE, related_name='extraction_cache',
+    )
+    key = models.CharField(max_length=64, db_index=True)
+    raw_extraction = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'recruitment_extraction_cache'
+        constraints = [
+            models.UniqueConstraint(fields=['cv_document', 'key'], name='extraction_cache_document_key'),
+        ]
+
+    def __str__(self):
+        return f"ExtractionCache {self.key[:12]}"
+
+
+# Statusy "w toku" — pollowane przez endpointy statusu matchingu; czesciowe
+# indeksy JobFitResult sa zalozone dokladnie na ten warunek. 'queued' = fit
+# czeka na wyniki OpenAI Batch API (do 24h) — tez jeszcze nie jest gotowy.
+FIT_IN_FLIGHT_STATUSES = ['pending', 'processing', 'pending_ai', 'queued']
+
 
 class JobFitResult(models.Model):
     """Wynik dopasowania kandydata do stanowiska."""
 
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('queued', 'Queued (Batch API)'),
         ('processing', 'Processing'),
         ('done', 'Done'),
         ('partial', 'Partial Results'),
@@ -196,6 +266,13 @@ class JobFitResult(models.Model):
     openai_tokens_used = models.PositiveIntegerField(default=0)
     processing_time_seconds = models.FloatField(null=True, blank=True)
     error_message = models.TextField(blank=True, default='')
+    batch_id = models.CharField(max_length=64, blank=True, default='')  # OpenAI Batch API
+    # Etap Batch API, na ktory czeka fit: 'match' (matching stanowisk) albo
+    # 'analysis' (analiza wymagan + scoring sekcji)
+    batch_stage = models.CharField(max_length=10, blank=True, default='')
+    # Wymagania wyslane w batchu 'analysis' (kolejnosc = indeksy odpowiedzi AI);
+    # None gdy prompt wymagan nie byl wysylany
+    batch_requirements = models.JSONField(null=True, blank=True)
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -205,6 +282,40 @@ class JobFitResult(models.Model):
         ordering = ['-overall_match', '-created_at']
         unique_together = ['candidate', 'position']
         db_table = 'recruitment_job_fit_result'
+        indexes = [
+            models.Index(
+                fields=['candidate', 'status', 'overall_match'],
+                name='fit_candidate_status_match_idx',
+            ),
+            models.Index(fields=['user', 'status'], name='fit_user_status_idx'),
+            # Polling statusu (bulk / selective matching) — tylko fity w toku,
+            # indeks nie rosnie razem z historia 'done'
+            models.Index(
+                fields=['user'], name='fit_user_inflight_idx',
+                condition=models.Q(status__in=FIT_IN_FLIGHT_STATUSES),
+            ),
+            models.Index(
+                fields=['candidate'], name='fit_candidate_inflight_idx',
+                condition=models.Q(status__in=FIT_IN_FLIGHT_STATUSES),
+            ),
+            # Ranking kandydatow na stronie stanowiska (sortowanie po wybranym score)
+            models.Index(
+                fields=['position', '-overall_match'], name='fit_pos_done_overall_idx',
+                condition=models.Q(status='done'),
+            ),
+            models.Index(
+                fields=['position', '-skill_match'], name='fit_pos_done_skill_idx',
+                condition=models.Q(status='done'),
+            ),
+            models.Index(
+                fields=['position', '-experience_match'], name='fit_pos_done_exp_idx',
+                condition=models.Q(status='done'),
+            ),
+            models.Index(
+                fields=['position', '-seniority_match'], name='fit_pos_done_seniority_idx',
+                condition=models.Q(status='done'),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.candidate.name} → {self.position.title} ({self.overall_match}%)"
@@ -0,0 +1,102 @@
+"""recruitment/services/dashboard_stats.py - Statystyki dashboardu rekrutacji z cache (Redis).
+
+Dashboard jest odswiezany przy kazdym wejsciu, a liczniki i top kandydaci nie
+musza byc co do sekundy aktualne — trzymamy je w cache per uzytkownik z krotkim
+TTL. Zapis/usuniecie stanowiska, profilu lub wyniku dopasowania czysci cache
+uzytkownika (recruitment/signals.py); zmiany przez update()/bulk_update()
+sygnalow nie wysylaja — batch matching (position_matcher) czysci cache jawnie.
+"""
+
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Avg, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recruitment.models import CandidateProfile, JobFitResult, JobPosition
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_STATS_TTL = 60
+TOP_CANDIDATES_TTL = 60 * 5
+TOP_CANDIDATES_LIMIT = 10
+
+
+def _stats_key(user_id):
+    return f'recruitment:dash:{user_id}'
+
+
+def _top_candidates_key(user_id):
+    return f'recruitment:dash_top:{user_id}'
+
+
+def _cached(key, ttl, compute):
+    try:
+        value = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Dashboard cache read failed: {e}")
+        value = None
+    if value is not None:
+        return value
+
+    value = compute()
+    try:
+        cache.set(key, value, ttl)
+    except Exception as e:
+        logger.warning(f"Dashboard cache write failed: {e}")
+    return value
+
+
+def _count_subquery(queryset):
+    """COUNT(*) querysetu (zawezonego do 1 uzytkownika) jako skalarne podzapytanie."""
+    counted = queryset.order_by().values('user').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted), 0)
+
+
+def get_dashboard_stats(user):
+    """Liczniki dashboardu: total_positions, total_candidates, total_matches."""
+    def compute():
+        # 3 liczniki jednym SELECT-em (skalarne podzapytania) zamiast 3x count()
+        return get_user_model().objects.filter(pk=user.pk).values(
+            total_positions=_count_subquery(
+                JobPosition.objects.filter(user=user, is_active=True),
+            ),
+            total_candidates=_count_subquery(
+                CandidateProfile.objects.filter(user=user, status='done'),
+            ),
+            total_matches=_count_subquery(
+                JobFitResult.objects.filter(user=user, status='done'),
+            ),
+        ).get()
+
+    return _cached(_stats_key(user.pk), DASHBOARD_STATS_TTL, compute)
+
+
+def get_top_candidates(user):
+    """Top kandydaci wg sredniego dopasowania — lista dictow (id, name, current_role, avg_match)."""
+    def compute():
+        # Srednia z podzapytania per kandydat (indeks candidate+status+overall_match)
+        # zamiast JOIN + GROUP BY po wszystkich fitach
+        avg_match = JobFitResult.objects.filter(
+            candidate=OuterRef('pk'), status='done',
+        ).order_by().values('candidate').annotate(avg=Avg('overall_match')).values('avg')
+        return list(
+            CandidateProfile.objects.filter(user=user, status='done')
+            .annotate(avg_match=Subquery(avg_match))
+            .filter(avg_match__isnull=False)
+            .order_by('-avg_match')
+            .values('id', 'name', 'current_role', 'avg_match')[:TOP_CANDIDATES_LIMIT]
+        )
+
+    return _cached(_top_candidates_key(user.pk), TOP_CANDIDATES_TTL, compute)
+
+
+def invalidate_dashboard_stats(user_id):
+    """Czysci cache dashboardu uzytkownika (po zmianie stanowisk/profili/wynikow)."""
+    if user_id is None:
+        return
+    try:
+        cache.delete_many([_stats_key(user_id), _top_candidates_key(user_id)])
+    except Exception as e:
+        logger.warning(f"Dashboard cache invalidation failed: {e}")
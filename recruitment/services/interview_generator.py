@@ -1,9 +1,8 @@
 """recruitment/services/interview_generator.py - Generowanie pytań rekrutacyjnych AI."""
 
-import json
 import logging
 
-from analysis.services.openai_client import OpenAIClient
+from analysis.services.openai_client import OpenAIClient, json_dumps
 from .prompts import SYSTEM_PROMPT, INTERVIEW_QUESTIONS_PROMPT
 
 logger = logging.getLogger(__name__)
@@ -25,7 +24,7 @@ class InterviewGenerator:
             profile = job_fit_result.candidate
             position = job_fit_result.position
 
-            profile_summary = json.dumps({
+            profile_summary = json_dumps({
                 'current_role': profile.current_role,
                 'years_experience': profile.years_of_experience,
                 'skills': profile.skills[:10],
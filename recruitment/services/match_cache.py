@@ -0,0 +1,65 @@
+"""recruitment/services/match_cache.py - Cache wynikow batch matchingu (Redis).
+
+Klucz = sha256(model + profil kandydata + dane stanowiska bez id). Ten sam profil
+vs to samo (lub identyczne) stanowisko nie wymaga ponownego wywolania OpenAI —
+np. ponowny upload tego samego CV albo ponowny matching wybranych stanowisk.
+"""
+
+import hashlib
+import json
+import logging
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+MATCH_CACHE_TTL = 60 * 60 * 24  # 24h
+
+
+def position_fingerprint(position_data):
+    """Kanoniczny JSON danych stanowiska bez id — identyczne stanowiska = ten sam odcisk."""
+    data = {k: v for k, v in position_data.items() if k != 'id'}
+    return json.dumps(data, sort_keys=True)
+
+
+class MatchResultCache:
+    """Cache match_data (wynik AI dla 1 stanowiska) per (profil, stanowisko)."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def _key(self, profile_json, position_data):
+        raw = '\0'.join((self.model, profile_json, position_fingerprint(position_data)))
+        return 'match_result:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get_many(self, profile_json, positions_data):
+        """Zwraca {position_id: match_data} dla trafien w cache."""
+        keys = {}
+        for data in positions_data:
+            keys.setdefault(self._key(profile_json, data), []).append(data['id'])
+        try:
+            found = cache.get_many(list(keys))
+        except Exception as e:
+            logger.warning(f"Match cache read failed: {e}")
+            return {}
+
+        hits = {}
+        for key, match_data in found.items():
+            for pid in keys[key]:
+                hits[pid] = {**match_data, 'position_id': pid}
+        return hits
+
+    def set_many(self, profile_json, positions_data, matches):
+        """Zapisuje wyniki AI (lista 'matches' z position_id) do cache."""
+        by_id = {data['id']: data for data in positions_data}
+        to_store = {}
+        for match_data in matches:
+            data = by_id.get(match_data.get('position_id', ''))
+            if data:
+                to_store[self._key(profile_json, data)] = match_data
+        if not to_store:
+            return
+        try:
+            cache.set_many(to_store, MATCH_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Match cache write failed: {e}")
@@ -4,21 +4,71 @@ Optymalizacja: 1 request OpenAI = WSZYSTKIE stanowiska naraz (do 10 w batchu).
 Fallback: single match dla >10 stanowisk (dzieli na chunki).
 """
 
-import json
 import logging
 import time
-from django.db.models import Avg, Count
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
 
 from recruitment.models import JobPosition, JobFitResult
-from analysis.services.openai_client import OpenAIClient
-from .prompts import SYSTEM_PROMPT, BATCH_MATCH_PROMPT, POSITION_MATCH_PROMPT
-from .requirement_matcher import analyze_cv_against_position
-from .section_scorer import score_sections
+from analysis.services.json_stream import JsonArrayStream
+from analysis.services.openai_client import OpenAIClient, count_tokens, json_dumps
+from analysis.services.progress import set_progress, set_progress_many
+from .dashboard_stats import invalidate_dashboard_stats
+from .match_cache import MatchResultCache, position_fingerprint
+from .prompts import SYSTEM_PROMPT, render_batch_match, render_position_match
+from .requirement_matcher import (
+    analyze_cv_against_position, apply_requirement_response, position_stats_expressions,
+    prepare_requirement_analysis,
+)
+from .section_scorer import (
+    load_sections_by_type, parse_section_response, prepare_section_scoring,
+    save_section_scores, score_sections,
+)
 
 logger = logging.getLogger(__name__)
 
 MAX_BATCH_SIZE = 10
+MAX_PARALLEL_BATCHES = 4  # ile chunkow wysylamy do OpenAI rownolegle
+MAX_POST_MATCH_WORKERS = 5  # rownolegla analiza wymagan + sekcji per fit
+MATCH_OUTPUT_TOKENS = 180  # szacunkowa dlugosc odpowiedzi AI na 1 stanowisko
+PROMPT_CONTEXT_RATIO = 0.8  # prompt + odpowiedz <= 80% okna kontekstu
+
+# Wspolne pule per proces (nie nowa pula na kazde wywolanie): liczba watkow
+# i polaczen DB jest stala niezaleznie od liczby rownoleglych jobow. Hierarchia
+# batch-match -> post-match -> section-score (section_scorer) — zadanie nigdy
+# nie zleca pracy do wlasnej puli, wiec czekanie na futures nie blokuje sie.
+# Same requesty AI ogranicza AI_CALL_SLOTS (openai_client).
+_BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_PARALLEL_BATCHES, thread_name_prefix='batch-match')
+_POST_MATCH_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_POST_MATCH_WORKERS, thread_name_prefix='post-match')
+
+# Score'y 0-100 zwracane przez AI (kolejnosc = kolejnosc w odpowiedzi)
+_SCORE_FIELDS = (
+    'overall_match', 'skill_match', 'experience_match', 'seniority_match',
+    'education_match',
+)
+
+# Pola JobFitResult zapisywane po udanym matchingu (bulk_update)
+_RESULT_FIELDS = [
+    *_SCORE_FIELDS, 'matching_skills', 'missing_skills', 'fit_recommendation',
+    'raw_ai_response', 'openai_tokens_used', 'processing_time_seconds',
+    'status', 'progress', 'completed_at', 'error_message',
+]
+# Pola zapisywane przy wyslaniu 2. etapu Batch API
+_BATCH_FIELDS = ['batch_id', 'batch_stage', 'batch_requirements']
+_MISSING_FIELDS = [
+    'overall_match', 'status', 'error_message', 'processing_time_seconds',
+    'completed_at', 'progress',
+]
+
+# Statusy OpenAI Batch API oznaczajace "jeszcze w toku"
+BATCH_PENDING_STATUSES = ('validating', 'in_progress', 'finalizing', 'cancelling')
+
+# Etapy Batch API zapisywane w JobFitResult.batch_stage
+BATCH_STAGE_MATCH = 'match'
+BATCH_STAGE_ANALYSIS = 'analysis'
 
 
 class PositionMatcher:
@@ -26,10 +76,16 @@ class PositionMatcher:
 
     def __init__(self):
         self.client = OpenAIClient()
+        self.match_cache = MatchResultCache(self.client.model)
 
     def match_all_positions(self, candidate_profile, user):
         """Matching kandydata do WSZYSTKICH aktywnych stanowisk."""
         positions = list(JobPosition.objects.filter(user=user, is_active=True))
+        threshold = getattr(settings, 'OPENAI_BATCH_MATCH_THRESHOLD', 0)
+        if threshold and len(positions) >= threshold:
+            return self.match_all_positions_async_batch(
+                candidate_profile, user, positions=positions,
+            )
         return self._run_batch_matching(positions, candidate_profile, user, skip_done=True)
 
     def match_selected_positions(self, candidate_profile, user, position_ids):
@@ -39,213 +95,588 @@ class PositionMatcher:
         ))
         return self._run_batch_matching(positions, candidate_profile, user, skip_done=False)
 
-    def _run_batch_matching(self, positions, candidate_profile, user, skip_done=True):
-        """Wspolna logika batch matchingu."""
+    def match_all_positions_async_batch(self, candidate_profile, user, positions=None):
+        """Matching vs WSZYSTKIE stanowiska przez OpenAI Batch API (50% taniej, okno 24h).
+
+        Kazdy chunk MAX_BATCH_SIZE stanowisk = 1 linia JSONL w jednym batchu.
+        Fity zostaja w status='queued' do czasu, az poll_match_batches
+        odbierze wyniki (collect_batch_results).
+        """
+        if positions is None:
+            positions = list(JobPosition.objects.filter(user=user, is_active=True))
         if not positions:
             return []
 
-        fits = {}
-        for position in positions:
-            fit, created = JobFitResult.objects.get_or_create(
-                candidate=candidate_profile,
-                position=position,
-                defaults={'user': user, 'status': 'pending'},
+        fits = self._prepare_fits(positions, candidate_profile, user, skip_done=True)
+        if not fits:
+            return []
+
+        profile_json = candidate_profile.get_matching_profile_json()
+        positions_to_match = [p for p in positions if str(p.id) in fits]
+
+        requests = []
+        for chunk in self._chunk_positions(positions_to_match):
+            positions_data = self._unique_positions_data(
+                [self._position_data(p) for p in chunk]
+            )
+            for _, prompt in self._split_to_limits(profile_json, positions_data):
+                requests.append((f'chunk_{len(requests)}', SYSTEM_PROMPT, prompt))
+
+        fit_ids = [f.id for f in fits.values()]
+        try:
+            batch_id = self.client.submit_batch(requests)
+        except Exception as e:
+            logger.error(f"Batch API submit failed for {candidate_profile.name}: {e}")
+            JobFitResult.objects.filter(id__in=fit_ids).update(
+                status='failed', error_message=f'Batch API submit failed: {e}',
+            )
+            return []
+
+        JobFitResult.objects.filter(id__in=fit_ids).update(
+            status='queued', batch_id=batch_id, batch_stage=BATCH_STAGE_MATCH, progress=10,
+        )
+        logger.info(
+            f"Batch API: {candidate_profile.name} vs {len(positions_to_match)} positions "
+            f"queued as {batch_id} ({len(requests)} requests)"
+        )
+        return list(fits.values())
+
+    def collect_batch_results(self, batch_id):
+        """Odbiera wyniki batcha OpenAI i zapisuje je w fitach status='queued'.
+
+        Batch API dziala w 2 etapach: (1) matching stanowisk, po ktorym fity
+        zostaja w 'queued' z nowym batch_id, (2) analiza wymagan + scoring sekcji
+        (custom_id 'req:'/'sec:'), po ktorej fity sa 'done'. Etap jest zapisany
+        w fit.batch_stage — nie zgadujemy go z wynikow (batch, w ktorym
+        wszystkie requesty padly, nie ma pliku wynikow).
+
+        Returns:
+            status batcha OpenAI lub None gdy brak oczekujacych fitow
+        """
+        fits = {
+            str(f.position_id): f
+            for f in JobFitResult.objects.filter(
+                batch_id=batch_id, status='queued',
+            ).select_related('candidate__cv_document', 'position')
+        }
+        if not fits:
+            return None
+
+        status, results = self.client.retrieve_batch(batch_id)
+        if status in BATCH_PENDING_STATUSES:
+            return status
+
+        start_time = time.time()
+        positions = [f.position for f in fits.values()]
+        candidate_profile = next(iter(fits.values())).candidate
+
+        if status != 'completed':
+            JobFitResult.objects.filter(id__in=[f.id for f in fits.values()]).update(
+                status='failed', progress=100,
+                error_message=f'OpenAI batch {batch_id} ended with status: {status}',
+                completed_at=timezone.now(),
             )
-            if not created and skip_done and fit.status == 'done':
+            logger.error(f"Batch API: {batch_id} ended with status {status}")
+            return status
+
+        if next(iter(fits.values())).batch_stage == BATCH_STAGE_ANALYSIS:
+            self._apply_analysis_results(batch_id, list(fits.values()), results)
+            return status
+
+        matches = []
+        tokens_used = 0
+        for custom_id, result in results.items():
+            if result['error']:
+                logger.error(f"Batch API: {batch_id}/{custom_id} failed: {result['error']}")
                 continue
-            if not created:
-                fit.status = 'pending'
-                fit.save(update_fields=['status'])
-            fits[str(position.id)] = fit
+            data = self.client.parse_json_response(result['content'])
+            if not data or 'matches' not in data:
+                logger.error(f"Batch API: {batch_id}/{custom_id} unparseable response")
+                continue
+            matches.extend(data['matches'])
+            tokens_used += result['tokens_used']
+
+        self._apply_matches(
+            matches, positions, fits, candidate_profile, tokens_used, start_time,
+            defer_analysis=True,
+        )
+        return status
+
+    def _submit_analysis_batch(self, fits, candidate_profile):
+        """2. etap Batch API: prompty analizy wymagan + sekcji dla wszystkich fitow.
+
+        Returns:
+            batch_id albo None (brak promptow do wyslania lub blad submitu —
+            wtedy analiza idzie online)
+        """
+        cv_document = candidate_profile.cv_document
+        cv_text = cv_document.extracted_text or ''
+        sections_by_type = load_sections_by_type(cv_document)
+
+        requests = []
+        for fit in fits:
+            requirements, prompt = prepare_requirement_analysis(cv_text, fit.position)
+            # Wymagania zapisywane z fitem — stanowisko moze sie zmienic w oknie
+            # 24h, a indeksy odpowiedzi AI odnosza sie do wyslanej listy
+            fit.batch_requirements = None
+            if prompt is not None:
+                requests.append((f'req:{fit.id}', SYSTEM_PROMPT, prompt))
+                fit.batch_requirements = list(requirements)
+            _, to_score = prepare_section_scoring(fit, sections_by_type)
+            requests.extend(
+                (f'sec:{fit.id}:{section_type}', SYSTEM_PROMPT, section_prompt)
+                for section_type, _, _, section_prompt in to_score
+            )
+        if not requests:
+            return None
 
+        try:
+            batch_id = self.client.submit_batch(requests)
+        except Exception as e:
+            logger.error(f"Batch API: analysis submit failed, running online: {e}")
+            return None
+        logger.info(
+            f"Batch API: analysis for {candidate_profile.name} "
+            f"({len(fits)} fits) queued as {batch_id} ({len(requests)} requests)"
+        )
+        return batch_id
+
+    def _apply_analysis_results(self, batch_id, fits, results):
+        """Zapis wynikow 2. etapu Batch API — RequirementMatch, SectionScore, status 'done'."""
+        start_time = time.time()
+        cv_document = fits[0].candidate.cv_document
+        cv_text = cv_document.extracted_text or ''
+        sections_by_type = load_sections_by_type(cv_document)
+        no_result = {
+            'content': None, 'tokens_used': 0,
+            'error': f'No result in OpenAI batch {batch_id}',
+        }
+
+        for fit in fits:
+            try:
+                if fit.batch_requirements is not None:
+                    requirements = fit.batch_requirements
+                    response = results.get(f'req:{fit.id}', no_result)
+                else:
+                    # Prompt wymagan nie byl wysylany (brak wymagan/tekstu CV)
+                    # albo batch sprzed zapisu batch_requirements
+                    requirements, prompt = prepare_requirement_analysis(cv_text, fit.position)
+                    response = results.get(f'req:{fit.id}', no_result) if prompt is not None else None
+                apply_requirement_response(fit, requirements, response, self.client, start_time)
+
+                section_results, to_score = prepare_section_scoring(fit, sections_by_type)
+                for section_type, display_name, cleaned_text, _ in to_score:
+                    section_results[section_type] = parse_section_response(
+                        self.client, section_type, display_name, cleaned_text,
+                        results.get(f'sec:{fit.id}:{section_type}', no_result),
+                    )
+                save_section_scores(fit, section_results)
+            except Exception as e:
+                logger.error(f"Batch API: analysis of fit {fit.id} failed: {e}")
+                if fit.status == 'queued':
+                    fit.status = 'failed'
+                    fit.error_message = f'Analysis failed: {e}'
+                    fit.progress = 100
+                    fit.completed_at = timezone.now()
+                    fit.save(update_fields=['status', 'error_message', 'progress', 'completed_at'])
+
+        invalidate_dashboard_stats(fits[0].user_id)
+        logger.info(f"Batch API: analysis {batch_id} applied to {len(fits)} fits")
+
+    def _run_batch_matching(self, positions, candidate_profile, user, skip_done=True):
+        """Wspolna logika batch matchingu."""
+        if not positions:
+            return []
+
+        fits = self._prepare_fits(positions, candidate_profile, user, skip_done=skip_done)
         if not fits:
             return []
 
+        fit_ids = [f.id for f in fits.values()]
         for fit in fits.values():
             fit.status = 'processing'
-            fit.progress = 10
-            fit.save(update_fields=['status', 'progress'])
-
-        profile_json = json.dumps({
-            'name': candidate_profile.name,
-            'current_role': candidate_profile.current_role,
-            'years_of_experience': candidate_profile.years_of_experience,
-            'seniority_level': candidate_profile.seniority_level,
-            'skills': candidate_profile.skills,
-            'skill_levels': candidate_profile.skill_levels,
-            'education': candidate_profile.education,
-            'companies': candidate_profile.companies[:5],
-            'languages': candidate_profile.languages,
-        }, indent=2)
+        JobFitResult.objects.filter(id__in=fit_ids).update(status='processing')
+        set_progress_many(fit_ids, 10)
+
+        profile_json = candidate_profile.get_matching_profile_json()
 
         positions_to_match = [p for p in positions if str(p.id) in fits]
-        results = []
+        chunks = self._chunk_positions(positions_to_match)
+
+        if len(chunks) == 1:
+            return self._match_batch(profile_json, chunks[0], fits, candidate_profile)
 
-        for i in range(0, len(positions_to_match), MAX_BATCH_SIZE):
-            chunk = positions_to_match[i:i + MAX_BATCH_SIZE]
-            chunk_results = self._match_batch(
+        # Chunki sa niezalezne i I/O-bound (czekanie na OpenAI) — wysylamy je
+        # rownolegle, czas ~ max(latency) zamiast sumy.
+        results = []
+        futures = [
+            _BATCH_EXECUTOR.submit(
+                self._in_thread, self._match_batch,
                 profile_json, chunk, fits, candidate_profile,
             )
-            results.extend(chunk_results)
+            for chunk in chunks
+        ]
+        for future in futures:
+            results.extend(future.result())
 
         return results
 
+    @staticmethod
+    def _in_thread(fn, *args):
+        """Wywolanie fn w watku puli — zamyka polaczenie DB watku po zakonczeniu."""
+        try:
+            return fn(*args)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _prepare_fits(positions, candidate_profile, user, skip_done=True):
+        """Hurtowy get_or_create JobFitResult dla stanowisk. Zwraca {position_id: fit}."""
+        positions = list(positions)
+        fits_qs = JobFitResult.objects.filter(candidate=candidate_profile)
+        existing = {
+            f.position_id: f for f in fits_qs.filter(position__in=positions)
+        }
+
+        missing = [
+            JobFitResult(candidate=candidate_profile, position=p, user=user, status='pending')
+            for p in positions if p.id not in existing
+        ]
+        if missing:
+            JobFitResult.objects.bulk_create(missing, batch_size=100, ignore_conflicts=True)
+            # ignore_conflicts nie zwraca PK istniejacych wierszy (rownolegly
+            # request mogl je utworzyc) — brakujace fity czytamy z bazy
+            existing.update({
+                f.position_id: f
+                for f in fits_qs.filter(position__in=[f.position_id for f in missing])
+            })
+
+        fits = {}
+        reset_ids = []
+        for position in positions:
+            fit = existing.get(position.id)
+            if fit is None or (skip_done and fit.status == 'done'):
+                continue
+            if fit.status == 'queued' and fit.batch_id:
+                # Wyniki oplaconego batcha OpenAI sa w drodze — reset na 'pending'
+                # sprawilby, ze collect_batch_results je odrzuci
+                continue
+            fit.candidate = candidate_profile
+            fit.position = position
+            if fit.status != 'pending':
+                fit.status = 'pending'
+                reset_ids.append(fit.id)
+            fits[str(position.id)] = fit
+
+        if reset_ids:
+            JobFitResult.objects.filter(id__in=reset_ids).update(status='pending')
+        return fits
+
+    @staticmethod
+    def _position_data(p):
+        """Dane stanowiska do prompta — puste pola pomijane (mniej tokenow)."""
+        data = {
+            'id': str(p.id),
+            'title': p.title,
+            'department': p.department,
+            'seniority_level': p.seniority_level,
+            'required_skills': p.required_skills,
+            'optional_skills': p.optional_skills,
+            'years_of_experience_required': p.years_of_experience_required,
+            'requirements_description': p.requirements_description[:300],
+        }
+        return {k: v for k, v in data.items() if v not in ('', [], None)}
+
+    def _split_to_limits(self, profile_json, positions_data):
+        """Dzieli stanowiska (bisekcja), az prompt i odpowiedz zmieszcza sie w limitach modelu.
+
+        Zbyt dlugi prompt albo za dluga odpowiedz (> max_tokens, obciety JSON)
+        konczy sie bledem dopiero po pelnym czasie odpowiedzi — lepiej zawczasu
+        wyslac 2 mniejsze zapytania. Zwraca liste (positions_data, prompt).
+        """
+        prompt = render_batch_match(profile_json, json_dumps(positions_data))
+        context = getattr(settings, 'OPENAI_CONTEXT_TOKENS', 128000)
+        prompt_budget = context * PROMPT_CONTEXT_RATIO - self.client.max_tokens
+        fits_output = len(positions_data) * MATCH_OUTPUT_TOKENS <= self.client.max_tokens
+
+        if fits_output and count_tokens(prompt, self.client.model) <= prompt_budget:
+            return [(positions_data, prompt)]
+        if len(positions_data) == 1:
+            logger.warning(
+                f"Batch match: prompt for position {positions_data[0]['id']} "
+                f"exceeds model limits, sending anyway"
+            )
+            return [(positions_data, prompt)]
+
+        mid = len(positions_data) // 2
+        return (
+            self._split_to_limits(profile_json, positions_data[:mid])
+            + self._split_to_limits(profile_json, positions_data[mid:])
+        )
+
+    @classmethod
+    def _chunk_positions(cls, positions):
+        """Dzieli stanowiska na chunki po MAX_BATCH_SIZE *unikalnych* stanowisk.
+
+        Identyczne stanowiska (te same dane poza id) laduja w jednym chunku —
+        AI ocenia je raz, a _apply_matches powiela wynik na duplikaty.
+        """
+        groups = {}
+        for p in positions:
+            groups.setdefault(position_fingerprint(cls._position_data(p)), []).append(p)
+        groups = list(groups.values())
+        return [
+            [p for group in groups[i:i + MAX_BATCH_SIZE] for p in group]
+            for i in range(0, len(groups), MAX_BATCH_SIZE)
+        ]
+
+    @staticmethod
+    def _unique_positions_data(positions_data):
+        """Pomija stanowiska identyczne z wczesniejszym na liscie."""
+        seen = set()
+        unique = []
+        for data in positions_data:
+            fingerprint = position_fingerprint(data)
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                unique.append(data)
+        return unique
+
+    @classmethod
+    def _fan_out_duplicates(cls, matches, positions):
+        """Dokleja match_data dla stanowisk identycznych z ocenionym przez AI."""
+        data_by_id = {str(p.id): cls._position_data(p) for p in positions}
+        matched = {m.get('position_id', '') for m in matches}
+        if matched.issuperset(data_by_id):
+            return matches
+
+        by_fingerprint = {}
+        for match_data in matches:
+            data = data_by_id.get(match_data.get('position_id', ''))
+            if data:
+                by_fingerprint.setdefault(position_fingerprint(data), match_data)
+
+        duplicates = []
+        for pos_id, data in data_by_id.items():
+            match_data = by_fingerprint.get(position_fingerprint(data))
+            if pos_id not in matched and match_data is not None:
+                duplicates.append({**match_data, 'position_id': pos_id})
+        return matches + duplicates
+
     def _match_batch(self, profile_json, positions, fits, candidate_profile):
         """1 zapytanie AI = matching vs wiele stanowisk naraz."""
         start_time = time.time()
 
-        positions_data = []
-        for p in positions:
-            positions_data.append({
-                'id': str(p.id),
-                'title': p.title,
-                'department': p.department,
-                'seniority_level': p.seniority_level,
-                'required_skills': p.required_skills,
-                'optional_skills': p.optional_skills,
-                'years_of_experience_required': p.years_of_experience_required,
-                'requirements_description': p.requirements_description[:300],
-            })
+        # Trafienia w cache nie ida do OpenAI
+        positions_data = [self._position_data(p) for p in positions]
+        cached = self.match_cache.get_many(profile_json, positions_data)
+        to_match = self._unique_positions_data(
+            [d for d in positions_data if d['id'] not in cached]
+        )
 
-        positions_json = json.dumps(positions_data, indent=2)
+        # positions_data ma juz id jako str — bez ponownego str(UUID) per stanowisko
+        chunk_fits = [fits[d['id']] for d in positions_data if d['id'] in fits]
+        chunk_fit_ids = [f.id for f in chunk_fits]
 
-        # Progress 40%
-        for p in positions:
-            pid = str(p.id)
-            if pid in fits:
-                fits[pid].progress = 40
-                fits[pid].save(update_fields=['progress'])
+        set_progress_many(chunk_fit_ids, 40)
 
         try:
-            prompt = BATCH_MATCH_PROMPT.format(
-                profile_json=profile_json,
-                positions_json=positions_json,
+            matches = list(cached.values())
+            tokens_used = 0
+
+            if to_match:
+                for part, prompt in self._split_to_limits(profile_json, to_match):
+                    result = self.client.chat(
+                        SYSTEM_PROMPT, prompt,
+                        on_delta=self._streamed_progress(fits),
+                    )
+                    if result['error']:
+                        raise Exception(f"OpenAI API error: {result['error']}")
+
+                    data = self.client.parse_json_response(result['content'])
+                    if not data or 'matches' not in data:
+                        raise Exception("Failed to parse batch matching response")
+
+                    self.match_cache.set_many(profile_json, part, data['matches'])
+                    matches.extend(data['matches'])
+                    tokens_used += result['tokens_used']
+            else:
+                logger.info(f"Batch match: all {len(positions)} positions served from cache")
+
+            set_progress_many(chunk_fit_ids, 80)
+
+            return self._apply_matches(
+                matches, positions, fits, candidate_profile, tokens_used, start_time,
             )
 
-            result = self.client.chat(SYSTEM_PROMPT, prompt)
-            if result['error']:
-                raise Exception(f"OpenAI API error: {result['error']}")
+        except Exception as e:
+            logger.error(f"Batch matching failed: {e}")
+            for fit in chunk_fits:
+                fit.status = 'failed'
+                fit.error_message = str(e)
+                fit.processing_time_seconds = time.time() - start_time
+            JobFitResult.objects.bulk_update(
+                chunk_fits, ['status', 'error_message', 'processing_time_seconds'],
+            )
+            return []
 
-            data = self.client.parse_json_response(result['content'])
-            if not data or 'matches' not in data:
-                raise Exception("Failed to parse batch matching response")
-
-            # Progress 80%
-            for p in positions:
-                pid = str(p.id)
-                if pid in fits:
-                    fits[pid].progress = 80
-                    fits[pid].save(update_fields=['progress'])
-
-            elapsed = time.time() - start_time
-            tokens_per_match = result['tokens_used'] // max(len(positions), 1)
-
-            updated = []
-            for match_data in data['matches']:
-                pos_id = match_data.get('position_id', '')
-                if pos_id not in fits:
-                    continue
-
-                fit = fits[pos_id]
-                scores = match_data.get('scores', {})
-                fit.overall_match = self._clamp(scores.get('overall_match'))
-                fit.skill_match = self._clamp(scores.get('skill_match'))
-                fit.experience_match = self._clamp(scores.get('experience_match'))
-                fit.seniority_match = self._clamp(scores.get('seniority_match'))
-                fit.education_match = self._clamp(scores.get('education_match'))
-
-                fit.matching_skills = match_data.get('matching_skills', [])
-                fit.missing_skills = match_data.get('missing_skills', [])
-                fit.fit_recommendation = match_data.get('fit_recommendation', '')[:20]
-
-                fit.raw_ai_response = match_data
-                fit.openai_tokens_used = tokens_per_match
-                fit.processing_time_seconds = elapsed
-                fit.status = 'done'
-                fit.progress = 100
-                fit.completed_at = timezone.now()
-                fit.error_message = ''
-                fit.save()
-                updated.append(fit)
+    @staticmethod
+    def _streamed_progress(fits):
+        """Callback on_delta: fit dostaje 80% gdy tylko jego match przyjdzie w streamie."""
+        stream = JsonArrayStream('matches')
+
+        def on_delta(text):
+            if text is None:
+                stream.reset()
+                return
+            for match_data in stream.feed(text):
+                fit = fits.get(match_data.get('position_id', ''))
+                if fit is not None:
+                    set_progress(fit.id, 80)
+
+        return on_delta
+
+    def _apply_matches(self, matches, positions, fits, candidate_profile, tokens_used, start_time,
+                       defer_analysis=False):
+        """Zapisuje wyniki AI (lista 'matches') w fitach + analiza wymagan i sekcji.
+
+        defer_analysis: analiza wymagan i sekcji idzie jako 2. etap Batch API
+        (fity zostaja w 'queued'), a nie online.
+        """
+        elapsed = time.time() - start_time
+        tokens_per_match = tokens_used // max(len(positions), 1)
+        matches = self._fan_out_duplicates(matches, positions)
+
+        updated = []
+        for match_data in matches:
+            pos_id = match_data.get('position_id', '')
+            if pos_id not in fits:
+                continue
 
-                logger.info(
-                    f"Batch match: {candidate_profile.name} → "
-                    f"{fit.position.title} = {fit.overall_match}%"
-                )
+            fit = fits[pos_id]
+            self._apply_scores(fit, match_data.get('scores', {}))
+
+            fit.matching_skills = match_data.get('matching_skills', [])
+            fit.missing_skills = match_data.get('missing_skills', [])
+            fit.fit_recommendation = match_data.get('fit_recommendation', '')[:20]
+
+            fit.raw_ai_response = match_data
+            fit.openai_tokens_used = tokens_per_match
+            fit.processing_time_seconds = elapsed
+            fit.status = 'done'
+            fit.progress = 100
+            fit.completed_at = timezone.now()
+            fit.error_message = ''
+            updated.append(fit)
+
+            logger.info(
+                f"Batch match: {candidate_profile.name} → "
+                f"{fit.position.title} = {fit.overall_match}%"
+            )
+
+        # Positions AI didn't return scores for
+        updated_ids = {f.pk for f in updated}
+        missing = []
+        for p in positions:
+            fit = fits.get(str(p.id))
+            if fit is not None and fit.pk not in updated_ids:
+                fit.overall_match = 0
+                fit.status = 'failed'
+                fit.error_message = 'AI matching did not return results for this position.'
+                fit.processing_time_seconds = time.time() - start_time
+                fit.completed_at = timezone.now()
+                fit.progress = 100
+                missing.append(fit)
+                logger.warning(f"Batch match: no AI result for {p.title}, set to 0%")
 
-            # Requirement-by-requirement analysis for each matched position
-            cv_text = candidate_profile.cv_document.extracted_text or ''
+        analysis_batch_id = None
+        if defer_analysis and updated:
+            analysis_batch_id = self._submit_analysis_batch(updated, candidate_profile)
+        if analysis_batch_id:
             for fit in updated:
-                try:
-                    analyze_cv_against_position(cv_text, fit.position, fit)
-                    logger.info(
-                        f"Requirement match: {candidate_profile.name} → "
-                        f"{fit.position.title} = {fit.overall_match}% "
-                        f"({fit.get_classification()})"
-                    )
-                except Exception as req_err:
-                    logger.error(
-                        f"Requirement matching failed for {fit.position.title}: {req_err}"
-                    )
+                fit.status = 'queued'
+                fit.progress = 80
+                fit.completed_at = None
+                fit.batch_id = analysis_batch_id
+                fit.batch_stage = BATCH_STAGE_ANALYSIS
+
+        with transaction.atomic():
+            JobFitResult.objects.bulk_update(
+                updated,
+                _RESULT_FIELDS + _BATCH_FIELDS if analysis_batch_id else _RESULT_FIELDS,
+                batch_size=100,
+            )
+            JobFitResult.objects.bulk_update(missing, _MISSING_FIELDS, batch_size=100)
 
-            # Section-by-section scoring for each matched position
+        if analysis_batch_id:
+            self._update_position_stats_many(positions)
+            invalidate_dashboard_stats(candidate_profile.user_id)
+            return updated
+
+        # Analiza wymagan + scoring sekcji — kazdy fit to osobne wywolania
+        # OpenAI (I/O-bound), wiec fity przetwarzamy rownolegle
+        cv_document = candidate_profile.cv_document
+        cv_text = cv_document.extracted_text or ''
+        sections_by_type = load_sections_by_type(cv_document) if updated else {}
+        if len(updated) > 1:
+            futures = [
+                _POST_MATCH_EXECUTOR.submit(
+                    self._in_thread, self._post_process_fit,
+                    cv_text, sections_by_type, fit, candidate_profile,
+                )
+                for fit in updated
+            ]
+            for future in futures:
+                future.result()
+        else:
             for fit in updated:
-                try:
-                    score_sections(fit)
-                    logger.info(
-                        f"Section scoring done: {candidate_profile.name} → "
-                        f"{fit.position.title}"
-                    )
-                except Exception as sec_err:
-                    logger.error(
-                        f"Section scoring failed for {fit.position.title}: {sec_err}"
-                    )
+                self._post_process_fit(cv_text, sections_by_type, fit, candidate_profile)
 
-            # Fill missing results — positions AI didn't return scores for
-            updated_ids = {str(f.position_id) for f in updated}
-            for p in positions:
-                pid = str(p.id)
-                if pid in fits and pid not in updated_ids:
-                    fit = fits[pid]
-                    fit.overall_match = 0
-                    fit.status = 'failed'
-                    fit.error_message = 'AI matching did not return results for this position.'
-                    fit.processing_time_seconds = time.time() - start_time
-                    fit.completed_at = timezone.now()
-                    fit.progress = 100
-                    fit.save()
-                    logger.warning(f"Batch match: no AI result for {p.title}, set to 0%")
+        self._update_position_stats_many(positions)
+        # bulk_update()/update() nie wysylaja sygnalow (recruitment/signals.py)
+        invalidate_dashboard_stats(candidate_profile.user_id)
 
-            for p in positions:
-                self._update_position_stats(p)
+        logger.info(
+            f"Batch matching: {len(updated)}/{len(positions)} "
+            f"positions in {time.time() - start_time:.1f}s ({tokens_used} tokens)"
+        )
+        return updated
 
+    @staticmethod
+    def _post_process_fit(cv_text, sections_by_type, fit, candidate_profile):
+        """Requirement-by-requirement analysis + section scoring dla 1 fitu."""
+        try:
+            analyze_cv_against_position(cv_text, fit.position, fit)
             logger.info(
-                f"Batch matching: {len(updated)}/{len(positions)} "
-                f"positions in {time.time() - start_time:.1f}s ({result['tokens_used']} tokens)"
+                f"Requirement match: {candidate_profile.name} → "
+                f"{fit.position.title} = {fit.overall_match}% "
+                f"({fit.get_classification()})"
+            )
+        except Exception as req_err:
+            logger.error(
+                f"Requirement matching failed for {fit.position.title}: {req_err}"
             )
-            return updated
 
-        except Exception as e:
-            logger.error(f"Batch matching failed: {e}")
-            for p in positions:
-                pid = str(p.id)
-                if pid in fits:
-                    fit = fits[pid]
-                    fit.status = 'failed'
-                    fit.error_message = str(e)
-                    fit.processing_time_seconds = time.time() - start_time
-                    fit.save(update_fields=['status', 'error_message', 'processing_time_seconds'])
-            return []
+        try:
+            score_sections(fit, sections_by_type)
+            logger.info(
+                f"Section scoring done: {candidate_profile.name} → "
+                f"{fit.position.title}"
+            )
+        except Exception as sec_err:
+            logger.error(
+                f"Section scoring failed for {fit.position.title}: {sec_err}"
+            )
 
     def match_single(self, fit_result_id):
         """Fallback: matching 1 kandydata vs 1 stanowisko."""
         fit = JobFitResult.objects.select_related(
-            'candidate', 'position',
+            'candidate__cv_document', 'position',
         ).get(id=fit_result_id)
 
         fit.status = 'processing'
-        fit.progress = 10
-        fit.save(update_fields=['status', 'progress'])
+        fit.save(update_fields=['status'])
+        set_progress(fit.id, 10)
 
         start_time = time.time()
 
@@ -253,35 +684,13 @@ class PositionMatcher:
             profile = fit.candidate
             position = fit.position
 
-            profile_json = json.dumps({
-                'name': profile.name,
-                'current_role': profile.current_role,
-                'years_of_experience': profile.years_of_experience,
-                'seniority_level': profile.seniority_level,
-                'skills': profile.skills,
-                'skill_levels': profile.skill_levels,
-                'education': profile.education,
-                'companies': profile.companies[:5],
-                'languages': profile.languages,
-            }, indent=2)
-
-            position_json = json.dumps({
-                'title': position.title,
-                'department': position.department,
-                'seniority_level': position.seniority_level,
-                'required_skills': position.required_skills,
-                'optional_skills': position.optional_skills,
-                'years_of_experience_required': position.years_of_experience_required,
-                'requirements_description': position.requirements_description[:500],
-            }, indent=2)
-
-            fit.progress = 40
-            fit.save(update_fields=['progress'])
-
-            prompt = POSITION_MATCH_PROMPT.format(
-                profile_json=profile_json,
-                position_json=position_json,
-            )
+            profile_json = profile.get_matching_profile_json()
+
+            position_json = json_dumps(self._position_data(position))
+
+            set_progress(fit.id, 40)
+
+            prompt = render_position_match(profile_json, position_json)
 
             result = self.client.chat(SYSTEM_PROMPT, prompt)
             if result['error']:
@@ -291,15 +700,9 @@ class PositionMatcher:
             if not data:
                 raise Exception("Failed to parse matching response")
 
-            fit.progress = 80
-            fit.save(update_fields=['progress'])
+            set_progress(fit.id, 80)
 
-            scores = data.get('scores', {})
-            fit.overall_match = self._clamp(scores.get('overall_match'))
-            fit.skill_match = self._clamp(scores.get('skill_match'))
-            fit.experience_match = self._clamp(scores.get('experience_match'))
-            fit.seniority_match = self._clamp(scores.get('seniority_match'))
-            fit.education_match = self._clamp(scores.get('education_match'))
+            self._apply_scores(fit, data.get('scores', {}))
 
             fit.matching_skills = data.get('matching_skills', [])
             fit.missing_skills = data.get('missing_skills', [])
@@ -338,8 +741,18 @@ class PositionMatcher:
             fit.save(update_fields=['status', 'error_message', 'processing_time_seconds'])
             return fit
 
+    @classmethod
+    def _apply_scores(cls, fit, scores):
+        """Przepisuje score'y z odpowiedzi AI na fit, przycinajac do 0-100."""
+        clamp = cls._clamp
+        for field in _SCORE_FIELDS:
+            setattr(fit, field, clamp(scores.get(field)))
+
     @staticmethod
     def _clamp(value, min_val=0, max_val=100):
+        # Fast path: AI prawie zawsze zwraca int — bez try/except i konwersji
+        if type(value) is int:
+            return min_val if value < min_val else max_val if value > max_val else value
         if value is None:
             return None
         try:
@@ -349,10 +762,11 @@ class PositionMatcher:
 
     @staticmethod
     def _update_position_stats(position):
-        stats = position.fit_results.filter(status='done').aggregate(
-            avg_score=Avg('overall_match'),
-            count=Count('id'),
-        )
-        position.avg_match_score = stats['avg_score']
-        position.candidate_count = stats['count']
-        position.save(update_fields=['avg_match_score', 'candidate_count'])
+        JobPosition.objects.filter(pk=position.pk).update(**position_stats_expressions())
+
+    @staticmethod
+    def _update_position_stats_many(positions):
+        """Statystyki wielu pozycji: 1 UPDATE z podzapytaniami."""
+        JobPosition.objects.filter(
+            pk__in=[position.pk for position in positions],
+        ).update(**position_stats_expressions())
@@ -1,16 +1,38 @@
 """recruitment/services/profile_extractor.py - CV → CandidateProfile extraction."""
 
+import hashlib
 import logging
 import re
 import time
+from datetime import timedelta
 
-from recruitment.models import CandidateProfile
+from django.utils import timezone
+
+from recruitment.models import CandidateProfile, ExtractionCache
 from analysis.services.openai_client import OpenAIClient
 from analysis.services.text_cleaner import TextCleaner
-from .prompts import SYSTEM_PROMPT, PROFILE_EXTRACTION_PROMPT
+from .prompts import SYSTEM_PROMPT, render_profile_extraction
 
 logger = logging.getLogger(__name__)
 
+# Wpisy ExtractionCache starsze niz TTL sa pomijane i usuwane przez
+# prune_extraction_cache (Celery Beat) — tabela nie rosnie bez konca
+EXTRACTION_CACHE_TTL = timedelta(days=30)
+
+# Regex fallback (_extract_basic_info) — kompilowane raz przy imporcie
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+_PHONE_RE = re.compile(r'[\+]?[\d\s\-\(\)]{7,15}')
+_NON_DIGIT_RE = re.compile(r'\D')
+
+# Pierwsza linia (po strip) o dlugosci 1-59 bez '@' i cyfr — kandydat na imie.
+# Granice linii jak w str.splitlines() (m.in. \f = podzial strony z PDF).
+_LINE_BREAKS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+_NAME_LINE_RE = re.compile(
+    rf'(?:\A|(?<=[{_LINE_BREAKS}]))[^\S{_LINE_BREAKS}]*'
+    rf'([^\s@\d](?:[^{_LINE_BREAKS}@\d]{{0,57}}[^\s@\d])?)'
+    rf'[^\S{_LINE_BREAKS}]*(?=[{_LINE_BREAKS}]|\Z)'
+)
+
 
 class ProfileExtractor:
     """Wyciąga strukturalny profil kandydata z tekstu CV."""
@@ -62,15 +84,32 @@ class ProfileExtractor:
 
             cleaned_text = TextCleaner.clean(cv_text, max_length=4000)
 
-            prompt = PROFILE_EXTRACTION_PROMPT.format(cv_text=cleaned_text) + _lang_note
-            result = self.client.chat(SYSTEM_PROMPT, prompt)
+            prompt = render_profile_extraction(cleaned_text) + _lang_note
+
+            # Identyczny tekst CV + model + prompt → odpowiedz z cache, bez OpenAI
+            cache_key = self._cache_key(prompt)
+            data = ExtractionCache.objects.filter(
+                key=cache_key, cv_document__user=user,
+                created_at__gte=timezone.now() - EXTRACTION_CACHE_TTL,
+            ).values_list('raw_extraction', flat=True).first()
 
-            if result['error']:
-                raise Exception(f"OpenAI API error: {result['error']}")
+            if data:
+                logger.info(f"Profile extraction for CV {cv_document.id}: cache hit")
+            else:
+                result = self.client.chat(SYSTEM_PROMPT, prompt)
 
-            data = self.client.parse_json_response(result['content'])
-            if not data or 'profile' not in data:
-                raise Exception("Failed to parse extraction response")
+                if result['error']:
+                    raise Exception(f"OpenAI API error: {result['error']}")
+
+                data = self.client.parse_json_response(result['content'])
+                if not data or 'profile' not in data:
+                    raise Exception("Failed to parse extraction response")
+
+                # created_at odswiezany takze przy nadpisaniu wygaslego wpisu
+                ExtractionCache.objects.update_or_create(
+                    cv_document=cv_document, key=cache_key,
+                    defaults={'raw_extraction': data, 'created_at': timezone.now()},
+                )
 
             p = data['profile']
             profile.name = p.get('name', '')[:255]
@@ -131,26 +170,36 @@ class ProfileExtractor:
                 profile.save(update_fields=['status', 'error_message'])
             return profile
 
+    def _cache_key(self, prompt):
+        raw = '\0'.join((self.client.model, SYSTEM_PROMPT, prompt))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
     @staticmethod
     def _extract_basic_info(text):
         """Regex fallback: wyciąga email, phone, name z surowego tekstu CV."""
         result = {'email': '', 'phone': '', 'name': ''}
 
-        email_match = re.search(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text)
+        email_match = _EMAIL_RE.search(text)
         if email_match:
             result['email'] = email_match.group()
 
-        phone_match = re.search(r'[\+]?[\d\s\-\(\)]{7,15}', text)
+        phone_match = _PHONE_RE.search(text)
         if phone_match:
             candidate = phone_match.group().strip()
-            digits = re.sub(r'\D', '', candidate)
+            digits = _NON_DIGIT_RE.sub('', candidate)
             if 7 <= len(digits) <= 15:
                 result['phone'] = candidate
 
-        for line in text.split('\n'):
-            line = line.strip()
-            if line and len(line) < 60 and not re.search(r'[@\d]', line):
-                result['name'] = line
-                break
+        name_match = _NAME_LINE_RE.search(text)
+        if name_match:
+            result['name'] = name_match.group(1)
 
         return result
+
+
+def prune_extraction_cache():
+    """Usuwa wpisy ExtractionCache starsze niz EXTRACTION_CACHE_TTL. Zwraca liczbe usunietych."""
+    deleted, _ = ExtractionCache.objects.filter(
+        created_at__lt=timezone.now() - EXTRACTION_CACHE_TTL,
+    ).delete()
+    return deleted
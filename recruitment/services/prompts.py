@@ -4,6 +4,8 @@ Wszystkie prompty dopasowania zawieraja reguly semantyczne:
 synonimy, formy gramatyczne i odpowiedniki PL/EN traktowane jako pelne dopasowanie.
 """
 
+from string import Formatter
+
 SYSTEM_PROMPT = "You are an HR recruitment analyst. Respond only in valid JSON."
 
 # ---------------------------------------------------------------------------
@@ -278,3 +280,57 @@ Return JSON:
     "analysis": "..."
 }}"""
 )
+
+
+# ---------------------------------------------------------------------------
+# Prekompilowane szablony dla goracych sciezek (matching, ekstrakcja)
+# ---------------------------------------------------------------------------
+def _compile(template):
+    """Parsuje szablon str.format raz przy imporcie.
+
+    Zwraca render(**values) sklejajacy gotowe fragmenty tekstu przez ''.join —
+    bez ponownego skanowania szablonu w poszukiwaniu {pol} przy kazdym wywolaniu.
+    Wynik identyczny z template.format(**values) dla wartosci typu str.
+    """
+    pieces = [(literal, field) for literal, field, _, _ in Formatter().parse(template)]
+
+    def render(**values):
+        out = []
+        for literal, field in pieces:
+            out.append(literal)
+            if field is not None:
+                out.append(values[field])
+        return ''.join(out)
+
+    return render
+
+
+_render_batch_match = _compile(BATCH_MATCH_PROMPT)
+_render_position_match = _compile(POSITION_MATCH_PROMPT)
+_render_profile_extraction = _compile(PROFILE_EXTRACTION_PROMPT)
+_render_requirement_match = _compile(REQUIREMENT_MATCH_PROMPT)
+_render_section_score = _compile(SECTION_SCORE_PROMPT)
+
+
+def render_batch_match(profile_json, positions_json):
+    return _render_batch_match(profile_json=profile_json, positions_json=positions_json)
+
+
+def render_position_match(profile_json, position_json):
+    return _render_position_match(profile_json=profile_json, position_json=position_json)
+
+
+def render_profile_extraction(cv_text):
+    return _render_profile_extraction(cv_text=cv_text)
+
+
+def render_requirement_match(requirements_json, cv_text):
+    return _render_requirement_match(requirements_json=requirements_json, cv_text=cv_text)
+
+
+def render_section_score(position_requirements, section_name, section_text):
+    return _render_section_score(
+        position_requirements=position_requirements,
+        section_name=section_name,
+        section_text=section_text,
+    )
@@ -28,30 +28,31 @@ class RedFlagDetector:
             return flags
 
         # Job hopping: >3 zmiany w 3 lata
-        short_stints = [
-            c for c in companies
+        short_stints = sum(
+            1 for c in companies
             if c.get('duration_months') and c['duration_months'] < 12
-        ]
-        if len(short_stints) >= 3:
+        )
+        if short_stints >= 3:
             flags.append({
                 'type': 'job_hopping',
                 'severity': 'warning',
-                'description': f'{len(short_stints)} positions held for less than 1 year.',
+                'description': f'{short_stints} positions held for less than 1 year.',
             })
 
-        # Employment gaps: sprawdź luki między firmami
-        sorted_companies = sorted(
-            [c for c in companies if c.get('end_year')],
-            key=lambda c: c.get('start_year', 0),
+        # Employment gaps: luki miedzy kolejnymi firmami. Lata wyciagamy raz
+        # do krotek (start, end) — sort i porownanie par bez dict lookupow.
+        # `or 0`: AI zwraca null dla nieznanego roku.
+        spans = sorted(
+            (c.get('start_year') or 0, c['end_year'])
+            for c in companies if c.get('end_year')
         )
-        for i in range(1, len(sorted_companies)):
-            prev_end = sorted_companies[i - 1].get('end_year', 0)
-            curr_start = sorted_companies[i].get('start_year', 0)
-            if curr_start and prev_end and curr_start - prev_end >= 2:
+        for (_, prev_end), (curr_start, _) in zip(spans, spans[1:]):
+            gap = curr_start - prev_end
+            if curr_start and gap >= 2:
                 flags.append({
                     'type': 'employment_gap',
                     'severity': 'info',
-                    'description': f'Gap of ~{curr_start - prev_end} years between positions.',
+                    'description': f'Gap of ~{gap} years between positions.',
                 })
 
         return flags
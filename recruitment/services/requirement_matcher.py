@@ -1,37 +1,67 @@
 """recruitment/services/requirement_matcher.py - Dopasowanie requirement-by-requirement CV do pozycji."""
 
-import json
 import logging
 import re
 import time
+from functools import lru_cache
 
+from django.db.models import Avg, Count, FloatField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf, Round
 from django.utils import timezone
 
-from analysis.services.openai_client import OpenAIClient
+from analysis.services.chat_cache import cached_chat
+from analysis.services.openai_client import OpenAIClient, json_dumps
+from analysis.services.progress import set_progress
 from analysis.services.text_cleaner import TextCleaner
-from recruitment.models import RequirementMatch
-from recruitment.services.prompts import SYSTEM_PROMPT, REQUIREMENT_MATCH_PROMPT
+from recruitment.models import JobFitResult, JobPosition, RequirementMatch
+from recruitment.services.prompts import SYSTEM_PROMPT, render_requirement_match
 
 logger = logging.getLogger(__name__)
 
 MAX_REQUIREMENTS = 25
 
+SKILL_TYPES = frozenset({'skill_required', 'skill_optional'})
 
+_ITEM_SEPARATOR_RE = re.compile(r'[\n;]+')
+_ITEM_PREFIX_RE = re.compile(r'^[\s\-\*\u2022\d\.]+')
+
+
+@lru_cache(maxsize=4096)
 def split_text_to_items(text):
-    """Rozbija tekst (responsibilities/requirements) na atomiczne pozycje."""
+    """Rozbija tekst (responsibilities/requirements) na atomiczne pozycje.
+
+    Wynik cache'owany (tuple) — te same opisy stanowisk wracaja przy kazdym matchingu.
+    """
     if not text:
-        return []
-    lines = re.split(r'[\n;]+', text)
+        return ()
     items = []
-    for line in lines:
-        line = re.sub(r'^[\s\-\*\•\d\.]+', '', line).strip()
+    for line in _ITEM_SEPARATOR_RE.split(text):
+        line = _ITEM_PREFIX_RE.sub('', line).strip()
         if line and len(line) > 3:
             items.append(line)
-    return items
+    return tuple(items)
 
 
 def extract_requirements(position):
-    """Wyciaga atomiczne wymagania z JobPosition z typem i waga."""
+    """Wyciaga atomiczne wymagania z JobPosition z typem i waga.
+
+    Przy bulk matchingu ta sama pozycja wraca dla kazdego kandydata, wiec wynik
+    jest cache'owany per (pk, updated_at) — edycja pozycji (save()) zmienia klucz.
+    Zwracane dicty sa wspoldzielone miedzy wywolaniami — tylko do odczytu.
+    """
+    if position.pk is None or position.updated_at is None:
+        return list(_build_requirements(position))
+    return list(_cached_requirements(position.pk, position.updated_at, position))
+
+
+@lru_cache(maxsize=256)
+def _cached_requirements(pk, updated_at, position):
+    """Cache wymagan — pk i updated_at sa kluczem, position tylko zrodlem danych."""
+    return _build_requirements(position)
+
+
+def _build_requirements(position):
+    """Lista wymagan pozycji (tuple — wynik trafia do cache)."""
     requirements = []
 
     for skill in (position.required_skills or []):
@@ -78,7 +108,7 @@ def extract_requirements(position):
             'weight': RequirementMatch.WEIGHTS['language'],
         })
 
-    return requirements
+    return tuple(requirements)
 
 
 def analyze_cv_against_position(cv_text, position, fit_result):
@@ -89,9 +119,36 @@ def analyze_cv_against_position(cv_text, position, fit_result):
     3. Zapisuje RequirementMatch dla kazdego wymagania
     4. Oblicza wazony overall_match
     5. Ustawia klasyfikacje (Excellent/Strong/Moderate/Weak/Poor)
+
+    Etapy 1 i 3-5 sa tez dostepne osobno (prepare_requirement_analysis /
+    apply_requirement_response) — dla OpenAI Batch API, gdzie krok 2 jest asynchroniczny.
     """
     start_time = time.time()
 
+    requirements, prompt = prepare_requirement_analysis(cv_text, position)
+    if prompt is None:
+        apply_requirement_response(fit_result, requirements, None, None, start_time)
+        return
+
+    # Posredni postep tylko w Redis — w DB zapisywany jest stan koncowy
+    set_progress(fit_result.id, 20)
+
+    # 1 request OpenAI = wszystkie wymagania
+    client = OpenAIClient()
+    response = cached_chat(client, SYSTEM_PROMPT, prompt)
+
+    set_progress(fit_result.id, 60)
+
+    apply_requirement_response(fit_result, requirements, response, client, start_time)
+
+
+def prepare_requirement_analysis(cv_text, position):
+    """Wymagania pozycji + prompt dla AI (bez zapisu do bazy).
+
+    Returns:
+        (requirements, prompt) — prompt None gdy nie ma czego wysylac do AI
+        (brak wymagan albo brak tekstu CV)
+    """
     requirements = extract_requirements(position)
     if len(requirements) > MAX_REQUIREMENTS:
         logger.warning(
@@ -100,46 +157,39 @@ def analyze_cv_against_position(cv_text, position, fit_result):
         )
         requirements = requirements[:MAX_REQUIREMENTS]
     if not requirements:
-        fit_result.overall_match = 0
-        fit_result.fit_recommendation = 'poor'
-        fit_result.status = 'done'
-        fit_result.progress = 100
-        fit_result.completed_at = timezone.now()
-        fit_result.save()
-        return
+        return requirements, None
 
     # Czyszczenie CV
-    cleaned_cv = TextCleaner.clean(cv_text, max_length=4000)
+    cleaned_cv = TextCleaner.clean_cached(cv_text, max_length=4000)
     if not cleaned_cv:
+        return requirements, None
+
+    # Przygotuj liste wymagan dla promptu — duplikaty (np. "Python" w skills
+    # i w requirements_description) wysylane raz
+    req_list, _ = _unique_requirement_texts(requirements)
+    # Kompaktowy JSON — mniej tokenow w prompcie
+    prompt = render_requirement_match(json_dumps(req_list), cleaned_cv)
+    return requirements, prompt
+
+
+def apply_requirement_response(fit_result, requirements, response, client, start_time):
+    """Zapisuje wynik analizy: RequirementMatch + score'y i status fitu.
+
+    Args:
+        response: dict jak z OpenAIClient.chat() albo None, gdy prompt nie
+            byl wysylany (prepare_requirement_analysis zwrocil prompt=None)
+    """
+    if response is None:
         fit_result.overall_match = 0
         fit_result.fit_recommendation = 'poor'
         fit_result.status = 'done'
         fit_result.progress = 100
-        fit_result.error_message = 'No CV text to analyze.'
+        if requirements:
+            fit_result.error_message = 'No CV text to analyze.'
         fit_result.completed_at = timezone.now()
         fit_result.save()
         return
 
-    # Update progress
-    fit_result.progress = 20
-    fit_result.save(update_fields=['progress'])
-
-    # Przygotuj liste wymagan dla promptu
-    req_list = [r['text'] for r in requirements]
-    requirements_json = json.dumps(req_list, ensure_ascii=False)
-
-    prompt = REQUIREMENT_MATCH_PROMPT.format(
-        requirements_json=requirements_json,
-        cv_text=cleaned_cv,
-    )
-
-    # 1 request OpenAI = wszystkie wymagania
-    client = OpenAIClient()
-    response = client.chat(SYSTEM_PROMPT, prompt)
-
-    fit_result.progress = 60
-    fit_result.save(update_fields=['progress'])
-
     if response['error']:
         fit_result.status = 'failed'
         fit_result.error_message = response['error']
@@ -150,7 +200,11 @@ def analyze_cv_against_position(cv_text, position, fit_result):
 
     fit_result.openai_tokens_used = response.get('tokens_used', 0)
 
-    parsed = client.parse_json_response(response['content'])
+    # cached_chat() zwraca juz sparsowana odpowiedz; wyniki Batch API — nie
+    if 'parsed' in response:
+        parsed = response['parsed']
+    else:
+        parsed = client.parse_json_response(response['content'])
     if not parsed or 'requirements' not in parsed:
         fit_result.status = 'failed'
         fit_result.error_message = 'Invalid AI response format.'
@@ -159,20 +213,26 @@ def analyze_cv_against_position(cv_text, position, fit_result):
         fit_result.save()
         return
 
-    fit_result.raw_ai_response = parsed
-    fit_result.progress = 80
-    fit_result.save(update_fields=['progress', 'raw_ai_response', 'openai_tokens_used'])
+    set_progress(fit_result.id, 80)
 
     # Usun stare RequirementMatch dla tego fit_result (re-run)
     RequirementMatch.objects.filter(fit_result=fit_result).delete()
 
-    # Parsowanie wynikow i zapis RequirementMatch
+    # Parsowanie wynikow: RequirementMatch do zapisu + agregaty w tym samym
+    # przebiegu (z wartosci w pamieci, bez czytania z obiektow ORM)
     ai_results = parsed['requirements']
-    saved_matches = []
+    _, ai_index = _unique_requirement_texts(requirements)
+    new_matches = []
+    weighted_score = 0
+    max_possible = 0
+    type_sums = {}
+    matching_skills = []
+    missing_skills = []
 
     for i, req in enumerate(requirements):
-        # Znajdz odpowiadajacy wynik AI (po indeksie lub tekscie)
-        ai_match = ai_results[i] if i < len(ai_results) else None
+        # Znajdz odpowiadajacy wynik AI (po indeksie w liscie bez duplikatow)
+        j = ai_index[i]
+        ai_match = ai_results[j] if j < len(ai_results) else None
 
         match_pct = 0
         explanation = ''
@@ -181,42 +241,38 @@ def analyze_cv_against_position(cv_text, position, fit_result):
             match_pct = _clamp(ai_match.get('match_percentage', 0))
             explanation = ai_match.get('explanation', '')
 
-        rm = RequirementMatch.objects.create(
+        req_text = req['text']
+        req_type = req['type']
+        weight = req['weight']
+        new_matches.append(RequirementMatch(
             fit_result=fit_result,
-            requirement_text=req['text'],
-            requirement_type=req['type'],
+            requirement_text=req_text,
+            requirement_type=req_type,
             match_percentage=match_pct,
             explanation=explanation,
-            weight=req['weight'],
-        )
-        saved_matches.append(rm)
+            weight=weight,
+        ))
 
-    # Oblicz wazony overall_match
-    weighted_score = sum(rm.match_percentage * rm.weight for rm in saved_matches)
-    max_possible = sum(100 * rm.weight for rm in saved_matches)
-    overall_match = round((weighted_score / max_possible) * 100) if max_possible > 0 else 0
+        weighted_score += match_pct * weight
+        max_possible += 100 * weight
+        if req_type in SKILL_TYPES:
+            req_type = 'skill'
+            (matching_skills if match_pct >= 60 else missing_skills).append(req_text)
+        total, count = type_sums.get(req_type, (0, 0))
+        type_sums[req_type] = (total + match_pct, count + 1)
 
-    # Oblicz score'y per typ (skill, experience, etc.)
-    skill_matches = [rm for rm in saved_matches if rm.requirement_type in ('skill_required', 'skill_optional')]
-    exp_matches = [rm for rm in saved_matches if rm.requirement_type == 'experience']
-    lang_matches = [rm for rm in saved_matches if rm.requirement_type == 'language']
-    resp_matches = [rm for rm in saved_matches if rm.requirement_type == 'responsibility']
+    # 1 INSERT zamiast osobnego create() per wymaganie
+    RequirementMatch.objects.bulk_create(new_matches, batch_size=500)
+
+    overall_match = round((weighted_score / max_possible) * 100) if max_possible > 0 else 0
 
     fit_result.overall_match = _clamp(overall_match)
-    fit_result.skill_match = _avg_pct(skill_matches) if skill_matches else None
-    fit_result.experience_match = _avg_pct(exp_matches) if exp_matches else None
-    fit_result.education_match = _avg_pct(lang_matches) if lang_matches else None
-    fit_result.seniority_match = _avg_pct(resp_matches) if resp_matches else None
-
-    # Matching/missing skills
-    fit_result.matching_skills = [
-        rm.requirement_text for rm in saved_matches
-        if rm.requirement_type in ('skill_required', 'skill_optional') and rm.match_percentage >= 60
-    ]
-    fit_result.missing_skills = [
-        rm.requirement_text for rm in saved_matches
-        if rm.requirement_type in ('skill_required', 'skill_optional') and rm.match_percentage < 60
-    ]
+    fit_result.skill_match = _avg_pct(type_sums.get('skill'))
+    fit_result.experience_match = _avg_pct(type_sums.get('experience'))
+    fit_result.education_match = _avg_pct(type_sums.get('language'))
+    fit_result.seniority_match = _avg_pct(type_sums.get('responsibility'))
+    fit_result.matching_skills = matching_skills
+    fit_result.missing_skills = missing_skills
 
     # Klasyfikacja
     fit_result.fit_recommendation = _get_recommendation(overall_match)
@@ -227,25 +283,53 @@ def analyze_cv_against_position(cv_text, position, fit_result):
     fit_result.status = 'done'
     fit_result.progress = 100
     fit_result.completed_at = timezone.now()
-    fit_result.save()
+    # raw_ai_response (dane z matchingu stanowisk) nie jest tu nadpisywany
+    fit_result.save(update_fields=[
+        'openai_tokens_used', 'overall_match', 'skill_match', 'experience_match',
+        'education_match', 'seniority_match', 'matching_skills', 'missing_skills',
+        'fit_recommendation', 'processing_time_seconds', 'status', 'progress', 'completed_at',
+    ])
 
     # Update position stats
     _update_position_stats(fit_result.position)
 
 
+def _unique_requirement_texts(requirements):
+    """Teksty wymagan bez duplikatow (porownanie bez wielkosci liter i spacji).
+
+    Returns:
+        (texts, index) — texts: lista wysylana do AI; index[i]: pozycja
+        wymagania requirements[i] w texts (= indeks wyniku AI)
+    """
+    texts = []
+    positions = {}
+    index = []
+    for req in requirements:
+        key = req['text'].strip().lower()
+        if key not in positions:
+            positions[key] = len(texts)
+            texts.append(req['text'])
+        index.append(positions[key])
+    return texts, index
+
+
 def _clamp(value, min_val=0, max_val=100):
     """Ogranicza wartosc do zakresu."""
+    # Fast path: AI prawie zawsze zwraca int — bez try/except i konwersji
+    if type(value) is int:
+        return min_val if value < min_val else max_val if value > max_val else value
     try:
         return max(min_val, min(max_val, int(float(value))))
     except (TypeError, ValueError):
         return 0
 
 
-def _avg_pct(matches):
-    """Srednia procentowa z listy RequirementMatch."""
-    if not matches:
+def _avg_pct(total_count):
+    """Srednia procentowa z pary (suma match_percentage, liczba wymagan)."""
+    if not total_count:
         return None
-    return _clamp(round(sum(rm.match_percentage for rm in matches) / len(matches)))
+    total, count = total_count
+    return _clamp(round(total / count))
 
 
 def _get_recommendation(score):
@@ -264,17 +348,23 @@ def _get_recommendation(score):
 
 
 def _update_position_stats(position):
-    """Aktualizuje zagregowane statystyki pozycji."""
-    from django.db.models import Avg, Count
-    from recruitment.models import JobFitResult
-
-    stats = JobFitResult.objects.filter(
-        position=position, status='done',
-    ).aggregate(
-        avg_score=Avg('overall_match'),
-        total=Count('id'),
-    )
-
-    position.avg_match_score = round(stats['avg_score'], 1) if stats['avg_score'] else None
-    position.candidate_count = stats['total']
-    position.save(update_fields=['avg_match_score', 'candidate_count'])
+    """Aktualizuje zagregowane statystyki pozycji (1 UPDATE z podzapytaniami)."""
+    JobPosition.objects.filter(pk=position.pk).update(**position_stats_expressions())
+
+
+def position_stats_expressions():
+    """avg_match_score / candidate_count liczone w SQL dla UPDATE pozycji (OuterRef = pozycja).
+
+    Wspolne dla pojedynczej analizy i batch matchingu (position_matcher).
+    """
+    done = JobFitResult.objects.filter(
+        position=OuterRef('pk'), status='done',
+    ).order_by().values('position')
+    return {
+        # NullIf: srednia 0 zapisywana jako brak danych (jak dotychczas)
+        'avg_match_score': NullIf(
+            Round(Subquery(done.annotate(avg_score=Avg('overall_match')).values('avg_score')), 1),
+            Value(0.0, output_field=FloatField()),
+        ),
+        'candidate_count': Coalesce(Subquery(done.annotate(total=Count('id')).values('total')), 0),
+    }
@@ -2,12 +2,14 @@
 
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
+from analysis.services.chat_cache import cached_chat
 from analysis.services.openai_client import OpenAIClient
 from analysis.services.text_cleaner import TextCleaner
 from cv.models import CVSection
 from recruitment.models import SectionScore
-from recruitment.services.prompts import SYSTEM_PROMPT, SECTION_SCORE_PROMPT
+from recruitment.services.prompts import SYSTEM_PROMPT, render_section_score
 
 logger = logging.getLogger(__name__)
 
@@ -28,138 +30,167 @@ SECTION_DISPLAY_NAMES = {
     'interests': 'Zainteresowania',
 }
 
+# (section_type, display_name, weight) — stala specyfikacja 5 sekcji scoringu
+SECTION_SPEC = tuple(
+    (section_type, display_name, SectionScore.SECTION_WEIGHTS.get(section_type, 1.0))
+    for section_type, display_name in SECTION_DISPLAY_NAMES.items()
+)
+_SECTION_WEIGHTS = {section_type: weight for section_type, _, weight in SECTION_SPEC}
 
-def score_sections(fit_result):
+# Wspolna pula per proces — najnizszy poziom hierarchii pul z position_matcher
+# (zadania sekcji niczego dalej nie zlecaja). 5 watkow = 1 fit naraz bez kolejki.
+_SECTION_EXECUTOR = ThreadPoolExecutor(max_workers=len(SECTION_SPEC), thread_name_prefix='section-score')
+
+
+def load_sections_by_type(cv_document):
+    """Sekcje CV (zapisane podczas uploadu) zmapowane na typy scoringu.
+
+    Returns:
+        dict section_type -> tekst (wiele sekcji tego samego typu polaczone)
+    """
+    rows = CVSection.objects.filter(
+        document=cv_document, section_type__in=SECTION_TYPE_MAP.keys(),
+    ).values_list('section_type', 'content')
+
+    sections_by_type = {}
+    for section_type, content in rows:
+        mapped = SECTION_TYPE_MAP[section_type]
+        # Polacz jesli wiele sekcji tego samego typu
+        if mapped in sections_by_type:
+            sections_by_type[mapped] += '\n' + content
+        else:
+            sections_by_type[mapped] = content
+    return sections_by_type
+
+
+def score_sections(fit_result, sections_by_type=None):
     """Scoring sekcji CV wzgledem stanowiska.
 
-    1. Pobiera sekcje CV z CVSection
-    2. Dla kazdej z 5 sekcji: ocenia AI lub pomija
-    3. Zapisuje SectionScore
+    1. Pobiera sekcje CV z CVSection (chyba ze podano sections_by_type —
+       batch matching laduje je raz dla wszystkich fitow kandydata)
+    2. Dla kazdej z 5 sekcji: ocenia AI (rownolegle) lub pomija
+    3. Zapisuje SectionScore (1 bulk_create)
     4. Zwraca liste SectionScore
     """
-    candidate = fit_result.candidate
-    position = fit_result.position
-    cv_document = candidate.cv_document
+    results, to_score = prepare_section_scoring(fit_result, sections_by_type)
+
+    # Wywolania AI sa niezalezne i I/O-bound — rownolegle, czas ~ max(latency)
+    if to_score:
+        client = OpenAIClient()
+        futures = {
+            section_type: _SECTION_EXECUTOR.submit(
+                _score_section, client, section_type, display_name, cleaned_text, prompt,
+            )
+            for section_type, display_name, cleaned_text, prompt in to_score
+        }
+        for section_type, future in futures.items():
+            results[section_type] = future.result()
 
-    # Pobierz sekcje CV (zapisane podczas uploadu)
-    cv_sections = CVSection.objects.filter(document=cv_document)
-    sections_by_type = {}
-    for cs in cv_sections:
-        if cs.section_type in SECTION_TYPE_MAP:
-            mapped = SECTION_TYPE_MAP[cs.section_type]
-            # Polacz jesli wiele sekcji tego samego typu
-            if mapped in sections_by_type:
-                sections_by_type[mapped] += '\n' + cs.content
-            else:
-                sections_by_type[mapped] = cs.content
+    return save_section_scores(fit_result, results)
 
-    # Przygotuj wymagania pozycji (1 raz)
-    position_requirements = _build_position_requirements(position)
 
-    # Usun stare wyniki (re-run)
-    SectionScore.objects.filter(fit_result=fit_result).delete()
+def prepare_section_scoring(fit_result, sections_by_type=None):
+    """Sekcje oceniane lokalnie + prompty dla sekcji wymagajacych AI (bez zapisu do bazy).
 
-    client = OpenAIClient()
-    saved_scores = []
+    Returns:
+        (results, to_score) — results: section_type -> (score, analysis, section_content)
+        dla sekcji pustych/zbyt krotkich; to_score: lista
+        (section_type, display_name, cleaned_text, prompt) do oceny przez AI
+    """
+    position = fit_result.position
+    if sections_by_type is None:
+        sections_by_type = load_sections_by_type(fit_result.candidate.cv_document)
+
+    # Przygotuj wymagania pozycji (1 raz)
+    position_requirements = _build_position_requirements(position)
 
-    for section_type, display_name in SECTION_DISPLAY_NAMES.items():
-        weight = SectionScore.SECTION_WEIGHTS.get(section_type, 1.0)
+    # Sekcje puste / zbyt krotkie oceniamy lokalnie, reszta idzie do AI
+    results = {}
+    to_score = []
+    for section_type, display_name, _ in SECTION_SPEC:
         section_text = sections_by_type.get(section_type, '')
 
         if not section_text:
             # Sekcja nie znaleziona
-            ss = SectionScore.objects.create(
-                fit_result=fit_result,
-                section_name=section_type,
-                score=0,
-                weight=weight,
-                analysis='Sekcja nie zostala znaleziona w CV.',
-                section_content='',
-            )
-            saved_scores.append(ss)
+            results[section_type] = (0, 'Sekcja nie zostala znaleziona w CV.', '')
             continue
 
-        cleaned_text = TextCleaner.clean(section_text, max_length=2000)
+        cleaned_text = TextCleaner.clean_cached(section_text, max_length=2000)
 
         if len(cleaned_text) < 300:
             # Zbyt krotka sekcja — nie wysylaj do AI
             ratio = len(cleaned_text) / 300
             score = round(10 + (20 * ratio))  # 10-30%
-            ss = SectionScore.objects.create(
-                fit_result=fit_result,
-                section_name=section_type,
-                score=score,
-                weight=weight,
-                analysis=f'Sekcja zawiera zbyt malo informacji ({len(cleaned_text)} znakow). Automatyczna ocena.',
-                section_content=cleaned_text,
+            results[section_type] = (
+                score,
+                f'Sekcja zawiera zbyt malo informacji ({len(cleaned_text)} znakow). Automatyczna ocena.',
+                cleaned_text,
             )
-            saved_scores.append(ss)
             continue
 
-        # Wywolanie AI
-        prompt = SECTION_SCORE_PROMPT.format(
-            position_requirements=position_requirements,
-            section_name=display_name,
-            section_text=cleaned_text,
-        )
+        prompt = render_section_score(position_requirements, display_name, cleaned_text)
+        to_score.append((section_type, display_name, cleaned_text, prompt))
 
-        response = client.chat(SYSTEM_PROMPT, prompt)
-
-        if response['error']:
-            logger.error(f"Section scoring failed for {section_type}: {response['error']}")
-            ss = SectionScore.objects.create(
-                fit_result=fit_result,
-                section_name=section_type,
-                score=0,
-                weight=weight,
-                analysis=f'Blad analizy AI: {response["error"][:200]}',
-                section_content=cleaned_text,
-            )
-            saved_scores.append(ss)
-            continue
+    return results, to_score
 
-        parsed = client.parse_json_response(response['content'])
-        if not parsed:
-            ss = SectionScore.objects.create(
-                fit_result=fit_result,
-                section_name=section_type,
-                score=0,
-                weight=weight,
-                analysis='Nieprawidlowa odpowiedz AI.',
-                section_content=cleaned_text,
-            )
-            saved_scores.append(ss)
-            continue
 
-        score = max(0, min(100, float(parsed.get('score', 0))))
-        analysis = parsed.get('analysis', '')
-
-        ss = SectionScore.objects.create(
+def save_section_scores(fit_result, results):
+    """Zapisuje SectionScore dla wszystkich 5 sekcji (results: section_type -> krotka)."""
+    # Usun stare wyniki (re-run) i zapisz nowe jednym INSERT-em
+    SectionScore.objects.filter(fit_result=fit_result).delete()
+    saved_scores = SectionScore.objects.bulk_create([
+        SectionScore(
             fit_result=fit_result,
             section_name=section_type,
-            score=round(score, 1),
+            score=results[section_type][0],
             weight=weight,
-            analysis=analysis,
-            section_content=cleaned_text,
+            analysis=results[section_type][1],
+            section_content=results[section_type][2],
         )
-        saved_scores.append(ss)
-
-        logger.info(f"Section score: {display_name} = {score:.0f}% (weight {weight}x)")
+        for section_type, _, weight in SECTION_SPEC
+    ])
 
     # Oblicz wazony final score
     if saved_scores:
-        weighted_sum = sum(ss.score * ss.weight for ss in saved_scores)
-        max_sum = sum(100 * ss.weight for ss in saved_scores)
+        weighted_sum = sum(results[section_type][0] * weight for section_type, _, weight in SECTION_SPEC)
+        max_sum = sum(100 * weight for _, _, weight in SECTION_SPEC)
         final_score = round((weighted_sum / max_sum) * 100) if max_sum > 0 else 0
 
         logger.info(
-            f"Section final score for {candidate.name} → {position.title}: "
-            f"{final_score}%"
+            f"Section final score for {fit_result.candidate.name} → "
+            f"{fit_result.position.title}: {final_score}%"
         )
 
     return saved_scores
 
 
+def _score_section(client, section_type, display_name, cleaned_text, prompt):
+    """Ocena 1 sekcji przez AI (bez zapisu do bazy — watek puli)."""
+    response = cached_chat(client, SYSTEM_PROMPT, prompt)
+    return parse_section_response(client, section_type, display_name, cleaned_text, response)
+
+
+def parse_section_response(client, section_type, display_name, cleaned_text, response):
+    """Odpowiedz AI (dict jak z chat()) dla 1 sekcji → (score, analysis, section_content)."""
+    if response['error']:
+        logger.error(f"Section scoring failed for {section_type}: {response['error']}")
+        return 0, f'Blad analizy AI: {response["error"][:200]}', cleaned_text
+
+    # cached_chat() zwraca juz sparsowana odpowiedz; wyniki Batch API — nie
+    if 'parsed' in response:
+        parsed = response['parsed']
+    else:
+        parsed = client.parse_json_response(response['content'])
+    if not parsed:
+        return 0, 'Nieprawidlowa odpowiedz AI.', cleaned_text
+
+    score = max(0, min(100, float(parsed.get('score', 0))))
+    weight = _SECTION_WEIGHTS[section_type]
+    logger.info(f"Section score: {display_name} = {score:.0f}% (weight {weight}x)")
+
+    return round(score, 1), parsed.get('analysis', ''), cleaned_text
+
+
 def _build_position_requirements(position):
     """Buduje tekst wymagan pozycji dla promptu."""
     parts = []
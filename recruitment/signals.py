@@ -0,0 +1,17 @@
+"""recruitment/signals.py - Invalidacja cache dashboardu po zmianach danych rekrutacji."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recruitment.models import CandidateProfile, JobFitResult, JobPosition
+from recruitment.services.dashboard_stats import invalidate_dashboard_stats
+
+
+@receiver(post_save, sender=JobPosition)
+@receiver(post_delete, sender=JobPosition)
+@receiver(post_save, sender=CandidateProfile)
+@receiver(post_delete, sender=CandidateProfile)
+@receiver(post_save, sender=JobFitResult)
+@receiver(post_delete, sender=JobFitResult)
+def invalidate_dashboard_on_change(sender, instance, **kwargs):
+    invalidate_dashboard_stats(instance.user_id)
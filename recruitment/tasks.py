@@ -1,10 +1,16 @@
 """recruitment/tasks.py - Threading wrappers dla przetwarzania w tle.
 
-Używa thread_manager z semaphore (MAX_THREADS=5).
+Używa wspólnej puli thread_manager (MAX_THREADS = settings.AI_MAX_THREADS).
+Wyjątki (Celery): poll_match_batches — zadanie Beat dla OpenAI Batch API,
+selective_matching_task — matching wielu kandydatów z bulk analysis,
+extract_and_analyze_task — ekstrakcja profilu + analiza CV po uploadzie,
+prune_extraction_cache_task — czyszczenie wygaslych wpisow ExtractionCache (Beat).
 """
 
 import logging
 
+from celery import shared_task
+
 from analysis.services.thread_manager import run_with_limit
 
 logger = logging.getLogger(__name__)
@@ -88,7 +94,9 @@ def _run_bulk_matching(candidate_profile_id, user_id):
 
     try:
         user = User.objects.get(id=user_id)
-        profile = CandidateProfile.objects.get(id=candidate_profile_id, cv_document__user=user)
+        profile = CandidateProfile.objects.select_related('cv_document').get(
+            id=candidate_profile_id, cv_document__user=user,
+        )
         matcher = PositionMatcher()
         matcher.match_all_positions(profile, user)
 
@@ -112,9 +120,90 @@ def _run_selective_matching(candidate_profile_id, user_id, position_ids):
 
     try:
         user = User.objects.get(id=user_id)
-        profile = CandidateProfile.objects.get(id=candidate_profile_id, cv_document__user=user)
+        profile = CandidateProfile.objects.select_related('cv_document').get(
+            id=candidate_profile_id, cv_document__user=user,
+        )
         matcher = PositionMatcher()
         matcher.match_selected_positions(profile, user, position_ids)
 
     except Exception as e:
         logger.error(f"Selective matching thread failed: {e}")
+
+
+@shared_task
+def extract_and_analyze_task(cv_document_id, user_id, language='en'):
+    """Analiza CV (billing + historia) i ekstrakcja profilu jako zadanie Celery.
+
+    Uzywane przez upload w rekrutacji — widok tylko zapisuje pliki i od razu
+    robi redirect, cala praca AI odbywa sie w workerze.
+    """
+    from cv.models import CVDocument
+    from accounts.models import User
+    from analysis.tasks import run_analysis_task
+    from analysis.utils import start_cv_analysis
+
+    try:
+        user = User.objects.get(id=user_id)
+        cv_doc = CVDocument.objects.get(id=cv_document_id, user=user)
+        if cv_doc.injection_flag:
+            logger.warning(f"Skipping CV processing for {cv_document_id}: injection_flag is set")
+            return
+        # Analiza jako osobne zadanie Celery — ekstrakcja profilu (na ktora
+        # czeka strona uploadu) nie czeka na nia, a worker sledzi obie prace
+        start_cv_analysis(cv_doc, user, language=language, run=run_analysis_task.delay)
+    except Exception as e:
+        logger.error(f"CV analysis dispatch failed for {cv_document_id}: {e}")
+
+    _run_profile_extraction(cv_document_id, user_id, language)
+
+
+@shared_task
+def selective_matching_task(candidate_profile_id, user_id, position_ids):
+    """Matching kandydata do WYBRANYCH stanowisk jako zadanie Celery.
+
+    Uzywane przez bulk analysis — wszyscy kandydaci wysylani jedna grupa
+    do brokera zamiast watku per kandydat w procesie web.
+    """
+    _run_selective_matching(candidate_profile_id, user_id, position_ids)
+
+
+@shared_task
+def poll_match_batches():
+    """Odbiera wyniki zakończonych batchy OpenAI dla fitów status='queued'.
+
+    Uruchamiane cyklicznie przez Celery Beat (co 5 min).
+    """
+    from recruitment.models import JobFitResult
+    from recruitment.services.position_matcher import PositionMatcher
+
+    batch_ids = list(
+        JobFitResult.objects.filter(status='queued')
+        .exclude(batch_id='')
+        .order_by()
+        .values_list('batch_id', flat=True)
+        .distinct()
+    )
+    if not batch_ids:
+        return {'batches': 0}
+
+    matcher = PositionMatcher()
+    for batch_id in batch_ids:
+        try:
+            status = matcher.collect_batch_results(batch_id)
+            logger.info(f"Match batch {batch_id}: {status}")
+        except Exception as e:
+            logger.error(f"Match batch {batch_id} polling failed: {e}")
+    return {'batches': len(batch_ids)}
+
+
+@shared_task
+def prune_extraction_cache_task():
+    """Usuwa wygasle wpisy cache ekstrakcji profilu.
+
+    Uruchamiane codziennie przez Celery Beat.
+    """
+    from recruitment.services.profile_extractor import prune_extraction_cache
+
+    deleted = prune_extraction_cache()
+    logger.info(f"Extraction cache pruned: {deleted} entries")
+    return {'deleted': deleted}
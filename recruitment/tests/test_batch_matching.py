@@ -0,0 +1,272 @@
+"""recruitment/tests/test_batch_matching.py — Testy Batch API matchingu i podziału promptów (PositionMatcher).
+
+Uruchomienie:
+    python manage.py test recruitment.tests.test_batch_matching --verbosity=2
+
+collect_batch_results: etap 1 (matching) -> etap 2 (analiza wymagań + sekcji),
+pusty plik wyników, batch w toku / zakończony błędem. _prepare_fits nie
+resetuje fitów w kolejce.
+_split_to_limits: bisekcja stanowisk do limitów promptu i odpowiedzi modelu.
+
+Testy NIE korzystają z OpenAI API — klient jest podmieniony (submit/retrieve batch).
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, TestCase
+
+from accounts.models import User
+from analysis.services.openai_client import OpenAIClient
+from cv.models import CVDocument, CVSection
+from recruitment.models import (
+    CandidateProfile, JobFitResult, JobPosition, RequirementMatch, SectionScore,
+)
+from recruitment.services import position_matcher
+from recruitment.services.position_matcher import (
+    BATCH_STAGE_ANALYSIS, BATCH_STAGE_MATCH, MATCH_OUTPUT_TOKENS, PositionMatcher,
+)
+from recruitment.services.requirement_matcher import _unique_requirement_texts
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+CV_TEXT = 'Jan Kowalski\nPython developer\n' + 'Experience at ACME building Python and Django APIs. ' * 30
+
+
+def _fake_client_init(self):
+    self.client = None
+    self.model = 'test-model'
+    self.max_tokens = 2048
+    self.temperature = 0
+
+
+def _ok(content, tokens=10):
+    return {'content': json.dumps(content), 'tokens_used': tokens, 'error': None}
+
+
+def _match_result(fits):
+    return _ok({'matches': [
+        {
+            'position_id': position_id,
+            'scores': {'overall_match': 72, 'skill_match': 80, 'experience_match': 60},
+            'matching_skills': ['Python'],
+            'missing_skills': ['Go'],
+            'fit_recommendation': 'good_fit',
+        }
+        for position_id in fits
+    ]})
+
+
+def _analysis_results(requests):
+    """Odpowiedzi 2. etapu dla wyslanych requestow (custom_id 'req:' / 'sec:')."""
+    results = {}
+    for custom_id, _, _ in requests:
+        if custom_id.startswith('req:'):
+            fit = JobFitResult.objects.get(id=custom_id.split(':', 1)[1])
+            texts, _ = _unique_requirement_texts(fit.batch_requirements)
+            results[custom_id] = _ok({'requirements': [
+                {'requirement': text, 'match_percentage': 70, 'explanation': 'ok'} for text in texts
+            ]})
+        else:
+            results[custom_id] = _ok({'score': 65, 'analysis': 'ok'})
+    return results
+
+
+@patch.object(OpenAIClient, '__init__', _fake_client_init)
+class CollectBatchResultsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='hr', email='hr@example.com', plan='premium')
+        doc = CVDocument.objects.create(
+            user=self.user, original_filename='cv.pdf', file='cv.pdf', file_format='pdf',
+            extracted_text=CV_TEXT,
+        )
+        CVSection.objects.create(document=doc, section_type='experience', title='Experience',
+                                 content='Worked at ACME on Python services. ' * 20, order=0)
+        CVSection.objects.create(document=doc, section_type='skills', title='Skills',
+                                 content='Python, Django, PostgreSQL, Docker', order=1)
+        self.profile = CandidateProfile.objects.create(
+            user=self.user, cv_document=doc, name='Jan', skills=['Python', 'Django'], status='done',
+        )
+        self.positions = [
+            JobPosition.objects.create(
+                user=self.user, title=f'Backend {i}', required_skills=['Python', 'Go'],
+                optional_skills=['Docker'], requirements_description='Python; REST APIs',
+                responsibilities='Build APIs',
+            )
+            for i in range(2)
+        ]
+        for position in self.positions:
+            JobFitResult.objects.create(
+                user=self.user, candidate=self.profile, position=position,
+                status='queued', batch_id='batch-match', batch_stage=BATCH_STAGE_MATCH, progress=10,
+            )
+
+        self.matcher = PositionMatcher()
+        self.submitted = []
+        self.matcher.client.submit_batch = self._submit_batch
+        self.matcher.client.retrieve_batch = MagicMock()
+
+    def _submit_batch(self, requests):
+        self.submitted.append(requests)
+        return f'batch-analysis-{len(self.submitted)}'
+
+    def _fits(self):
+        return list(JobFitResult.objects.filter(candidate=self.profile).order_by('position__title'))
+
+    def _run_match_stage(self):
+        fit_ids = [str(p.id) for p in self.positions]
+        self.matcher.client.retrieve_batch.return_value = (
+            'completed', {'chunk_0': _match_result(fit_ids)},
+        )
+        return self.matcher.collect_batch_results('batch-match')
+
+    def test_pending_batch_leaves_fits_untouched(self):
+        self.matcher.client.retrieve_batch.return_value = ('in_progress', {})
+
+        self.assertEqual(self.matcher.collect_batch_results('batch-match'), 'in_progress')
+        for fit in self._fits():
+            self.assertEqual((fit.status, fit.batch_id), ('queued', 'batch-match'))
+
+    def test_failed_batch_fails_fits(self):
+        self.matcher.client.retrieve_batch.return_value = ('expired', {})
+
+        self.assertEqual(self.matcher.collect_batch_results('batch-match'), 'expired')
+        for fit in self._fits():
+            self.assertEqual(fit.status, 'failed')
+            self.assertIn('expired', fit.error_message)
+
+    def test_unknown_batch_returns_none(self):
+        self.assertIsNone(self.matcher.collect_batch_results('no-such-batch'))
+        self.matcher.client.retrieve_batch.assert_not_called()
+
+    def test_match_stage_queues_analysis_batch(self):
+        self.assertEqual(self._run_match_stage(), 'completed')
+
+        self.assertEqual(len(self.submitted), 1)
+        custom_ids = [custom_id for custom_id, _, _ in self.submitted[0]]
+        for fit in self._fits():
+            self.assertEqual(fit.status, 'queued')
+            self.assertEqual(fit.batch_id, 'batch-analysis-1')
+            self.assertEqual(fit.batch_stage, BATCH_STAGE_ANALYSIS)
+            self.assertEqual(fit.overall_match, 72)
+            self.assertTrue(fit.batch_requirements)
+            self.assertIn(f'req:{fit.id}', custom_ids)
+        self.assertFalse(RequirementMatch.objects.exists())
+
+    def test_analysis_stage_completes_fits(self):
+        self._run_match_stage()
+        self.matcher.client.retrieve_batch.return_value = (
+            'completed', _analysis_results(self.submitted[0]),
+        )
+
+        self.assertEqual(self.matcher.collect_batch_results('batch-analysis-1'), 'completed')
+
+        for fit in self._fits():
+            self.assertEqual((fit.status, fit.progress), ('done', 100))
+            self.assertEqual(
+                RequirementMatch.objects.filter(fit_result=fit).count(), len(fit.batch_requirements),
+            )
+            self.assertTrue(SectionScore.objects.filter(fit_result=fit).exists())
+        self.assertEqual(len(self.submitted), 1)
+
+    def test_analysis_stage_uses_submitted_requirements(self):
+        self._run_match_stage()
+        submitted = {fit.id: fit.batch_requirements for fit in self._fits()}
+        # Stanowisko edytowane w oknie batcha — indeksy odpowiedzi AI dotycza wyslanej listy
+        position = self.positions[0]
+        position.required_skills = ['Cobol'] + position.required_skills
+        position.save()
+        self.matcher.client.retrieve_batch.return_value = (
+            'completed', _analysis_results(self.submitted[0]),
+        )
+
+        self.matcher.collect_batch_results('batch-analysis-1')
+
+        for fit in self._fits():
+            texts = set(RequirementMatch.objects.filter(fit_result=fit).values_list('requirement_text', flat=True))
+            self.assertEqual(texts, {req['text'] for req in submitted[fit.id]})
+
+    def test_analysis_stage_with_empty_output_keeps_scores(self):
+        # Batch, w ktorym wszystkie requesty padly, nie ma pliku wynikow
+        self._run_match_stage()
+        self.matcher.client.retrieve_batch.return_value = ('completed', {})
+
+        self.assertEqual(self.matcher.collect_batch_results('batch-analysis-1'), 'completed')
+
+        for fit in self._fits():
+            self.assertEqual(fit.status, 'failed')
+            self.assertEqual(fit.overall_match, 72)
+        self.assertEqual(len(self.submitted), 1)
+
+    def test_rerun_keeps_queued_fits(self):
+        fits = self.matcher._prepare_fits(self.positions, self.profile, self.user, skip_done=False)
+
+        self.assertEqual(fits, {})
+        for fit in self._fits():
+            self.assertEqual((fit.status, fit.batch_id), ('queued', 'batch-match'))
+
+
+class SplitToLimitsTest(SimpleTestCase):
+    """Bisekcja stanowisk; count_tokens podmieniony na liczbe znakow promptu."""
+
+    def setUp(self):
+        self.matcher = PositionMatcher.__new__(PositionMatcher)
+        self.matcher.client = MagicMock(model='test-model', max_tokens=MATCH_OUTPUT_TOKENS * 4)
+        patcher = patch.object(position_matcher, 'count_tokens', lambda text, model: len(text))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _positions(n, description_len=10):
+        return [{'id': str(i), 'title': f'Position {i}', 'requirements_description': 'x' * description_len}
+                for i in range(n)]
+
+    def _split(self, positions_data, context_tokens):
+        with self.settings(OPENAI_CONTEXT_TOKENS=context_tokens):
+            return self.matcher._split_to_limits('{"name":"Jan"}', positions_data)
+
+    def _assert_covers(self, chunks, positions_data):
+        self.assertEqual([data for chunk, _ in chunks for data in chunk], positions_data)
+        for chunk, prompt in chunks:
+            self.assertEqual(
+                prompt,
+                position_matcher.render_batch_match(
+                    '{"name":"Jan"}', position_matcher.json_dumps(chunk),
+                ),
+            )
+
+    def test_fits_in_one_request(self):
+        positions_data = self._positions(3)
+        chunks = self._split(positions_data, context_tokens=128000)
+
+        self.assertEqual(len(chunks), 1)
+        self._assert_covers(chunks, positions_data)
+
+    def test_output_limit_splits_positions(self):
+        # max_tokens miesci odpowiedz dla najwyzej 4 stanowisk
+        positions_data = self._positions(10)
+        chunks = self._split(positions_data, context_tokens=128000)
+
+        self.assertTrue(all(len(chunk) <= 4 for chunk, _ in chunks))
+        self._assert_covers(chunks, positions_data)
+
+    def test_prompt_limit_splits_positions(self):
+        positions_data = self._positions(4, description_len=20000)
+        single = len(self._split(positions_data[:1], context_tokens=10 ** 6)[0][1])
+        # Budzet promptu = context * PROMPT_CONTEXT_RATIO - max_tokens ~ 1.5 promptu z 1 stanowiskiem
+        context = int((single * 1.5 + self.matcher.client.max_tokens) / position_matcher.PROMPT_CONTEXT_RATIO)
+        chunks = self._split(positions_data, context_tokens=context)
+
+        self.assertEqual([len(chunk) for chunk, _ in chunks], [1, 1, 1, 1])
+        self._assert_covers(chunks, positions_data)
+
+    def test_oversized_single_position_is_sent_anyway(self):
+        positions_data = self._positions(1, description_len=5000)
+        chunks = self._split(positions_data, context_tokens=100)
+
+        self.assertEqual(len(chunks), 1)
+        self._assert_covers(chunks, positions_data)
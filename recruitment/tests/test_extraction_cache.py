@@ -0,0 +1,89 @@
+"""recruitment/tests/test_extraction_cache.py — Cache ekstrakcji profilu (ExtractionCache).
+
+Uruchomienie:
+    python manage.py test recruitment.tests.test_extraction_cache --verbosity=2
+
+Wpis cache należy do dokumentu CV: trafienie tylko dla CV tego samego
+użytkownika, usunięcie CV (lub konta) usuwa wpis.
+Testy NIE korzystają z OpenAI API — klient jest podmieniony.
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from accounts.models import User
+from analysis.services.openai_client import OpenAIClient
+from cv.models import CVDocument
+from recruitment.models import ExtractionCache
+from recruitment.services.profile_extractor import ProfileExtractor
+
+CV_TEXT = 'Jan Kowalski\njan@example.com\nPython developer at ACME'
+
+EXTRACTION = {
+    'profile': {'name': 'Jan Kowalski', 'email': 'jan@example.com', 'skills': ['Python']},
+    'hr_summary': 'Python developer',
+}
+
+
+def _fake_client_init(self):
+    self.client = None
+    self.model = 'test-model'
+    self.max_tokens = 2048
+    self.temperature = 0
+    self.chat = MagicMock(return_value={
+        'content': json.dumps(EXTRACTION), 'tokens_used': 10, 'error': None,
+    })
+
+
+def _document(user, filename='cv.pdf'):
+    return CVDocument.objects.create(
+        user=user, original_filename=filename, file=filename, file_format='pdf', extracted_text=CV_TEXT,
+    )
+
+
+@patch.object(OpenAIClient, '__init__', _fake_client_init)
+class ExtractionCacheTest(TestCase):
+
+    def setUp(self):
+        self.anna = User.objects.create(username='anna', email='anna@example.com', plan='premium')
+        self.piotr = User.objects.create(username='piotr', email='piotr@example.com', plan='premium')
+
+    def _extract(self, document):
+        extractor = ProfileExtractor()
+        profile = extractor.extract_profile(document, document.user)
+        return profile, extractor.client.chat
+
+    def test_same_user_reuses_cached_response(self):
+        self._extract(_document(self.anna, 'cv1.pdf'))
+
+        profile, chat = self._extract(_document(self.anna, 'cv2.pdf'))
+
+        chat.assert_not_called()
+        self.assertEqual((profile.status, profile.name), ('done', 'Jan Kowalski'))
+
+    def test_other_user_does_not_get_cached_response(self):
+        self._extract(_document(self.anna))
+
+        profile, chat = self._extract(_document(self.piotr))
+
+        chat.assert_called_once()
+        self.assertEqual(profile.status, 'done')
+        self.assertEqual(ExtractionCache.objects.count(), 2)
+
+    def test_deleting_document_removes_cache_entry(self):
+        document = _document(self.anna)
+        self._extract(document)
+        self.assertTrue(ExtractionCache.objects.filter(cv_document=document).exists())
+
+        document.delete()
+
+        self.assertFalse(ExtractionCache.objects.exists())
+
+    def test_deleting_account_removes_cache_entry(self):
+        self._extract(_document(self.anna))
+
+        self.anna.delete()
+
+        self.assertFalse(ExtractionCache.objects.exists())
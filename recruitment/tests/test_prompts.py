@@ -0,0 +1,72 @@
+"""recruitment/tests/test_prompts.py — Testy prekompilowanych szablonów promptów (recruitment.services.prompts).
+
+Uruchomienie:
+    python manage.py test recruitment.tests.test_prompts --verbosity=2
+
+Renderery z _compile muszą dawać dokładnie to samo co template.format(**values).
+Testy NIE korzystają z bazy danych ani z OpenAI API.
+"""
+
+from django.test import SimpleTestCase
+
+from recruitment.services import prompts
+
+
+# Wartości z klamrami — wstawiane dosłownie, nie interpretowane jako pola szablonu
+PROFILE_JSON = '{"name":"Jan","skills":["Python","{x}"]}'
+POSITIONS_JSON = '[{"id":"1","title":"Dev {senior}"}]'
+CV_TEXT = 'Jan Kowalski\nPython developer {{not a field}}\nZażółć gęślą jaźń'
+
+
+class CompileTest(SimpleTestCase):
+
+    def test_matches_str_format(self):
+        template = 'A {first} B {{literal}} C {second}{first}'
+        render = prompts._compile(template)
+        values = {'first': '1', 'second': '{2}'}
+        self.assertEqual(render(**values), template.format(**values))
+
+    def test_template_without_fields(self):
+        self.assertEqual(prompts._compile('no {{fields}} here')(), 'no {fields} here')
+
+    def test_missing_field_raises(self):
+        with self.assertRaises(KeyError):
+            prompts._compile('{a} {b}')(a='x')
+
+
+class RenderPromptsTest(SimpleTestCase):
+
+    def test_render_batch_match(self):
+        self.assertEqual(
+            prompts.render_batch_match(PROFILE_JSON, POSITIONS_JSON),
+            prompts.BATCH_MATCH_PROMPT.format(profile_json=PROFILE_JSON, positions_json=POSITIONS_JSON),
+        )
+
+    def test_render_position_match(self):
+        self.assertEqual(
+            prompts.render_position_match(PROFILE_JSON, POSITIONS_JSON),
+            prompts.POSITION_MATCH_PROMPT.format(profile_json=PROFILE_JSON, position_json=POSITIONS_JSON),
+        )
+
+    def test_render_profile_extraction(self):
+        self.assertEqual(
+            prompts.render_profile_extraction(CV_TEXT),
+            prompts.PROFILE_EXTRACTION_PROMPT.format(cv_text=CV_TEXT),
+        )
+
+    def test_render_requirement_match(self):
+        requirements_json = '["Python","REST {APIs}"]'
+        self.assertEqual(
+            prompts.render_requirement_match(requirements_json, CV_TEXT),
+            prompts.REQUIREMENT_MATCH_PROMPT.format(requirements_json=requirements_json, cv_text=CV_TEXT),
+        )
+
+    def test_render_section_score(self):
+        self.assertEqual(
+            prompts.render_section_score('Python; Docker', 'Doświadczenie', CV_TEXT),
+            prompts.SECTION_SCORE_PROMPT.format(
+                position_requirements='Python; Docker',
+                section_name='Doświadczenie',
+                section_text=CV_TEXT,
+            ),
+        )
@@ -0,0 +1,51 @@
+"""recruitment/tests/test_requirement_texts.py — Testy deduplikacji wymagań wysyłanych do AI.
+
+Uruchomienie:
+    python manage.py test recruitment.tests.test_requirement_texts --verbosity=2
+
+_unique_requirement_texts zwraca listę bez duplikatów (prompt) i ai_index —
+pozycję wyniku AI dla każdego wymagania z pełnej listy.
+Testy NIE korzystają z bazy danych ani z OpenAI API.
+"""
+
+from django.test import SimpleTestCase
+
+from recruitment.services.requirement_matcher import _unique_requirement_texts
+
+
+def _req(text, req_type='skill_required'):
+    return {'text': text, 'type': req_type}
+
+
+class UniqueRequirementTextsTest(SimpleTestCase):
+
+    def test_no_duplicates(self):
+        texts, ai_index = _unique_requirement_texts([_req('Python'), _req('Docker'), _req('SQL')])
+        self.assertEqual(texts, ['Python', 'Docker', 'SQL'])
+        self.assertEqual(ai_index, [0, 1, 2])
+
+    def test_duplicates_ignore_case_and_whitespace(self):
+        requirements = [
+            _req('Python'),
+            _req('REST APIs', 'skill_optional'),
+            _req('  python '),
+            _req('Teamwork', 'responsibility'),
+            _req('rest apis'),
+        ]
+        texts, ai_index = _unique_requirement_texts(requirements)
+        # Pierwsze wystapienie decyduje o tekscie wyslanym do AI
+        self.assertEqual(texts, ['Python', 'REST APIs', 'Teamwork'])
+        self.assertEqual(ai_index, [0, 1, 0, 2, 1])
+
+    def test_ai_index_maps_every_requirement_to_its_result(self):
+        requirements = [_req('Go'), _req('Python'), _req('GO'), _req('Python'), _req('Kafka')]
+        texts, ai_index = _unique_requirement_texts(requirements)
+        # Odpowiedz AI: 1 wynik na unikalny tekst, w kolejnosci promptu
+        ai_results = [{'requirement': text} for text in texts]
+
+        self.assertEqual(len(ai_index), len(requirements))
+        for req, j in zip(requirements, ai_index):
+            self.assertEqual(ai_results[j]['requirement'].lower(), req['text'].strip().lower())
+
+    def test_empty(self):
+        self.assertEqual(_unique_requirement_texts([]), ([], []))
@@ -2,7 +2,9 @@
 
 import logging
 import re
+from functools import lru_cache, partial
 
+from celery import group
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
@@ -36,13 +38,18 @@ def _level_rank(level_str):
     return _SKILL_LEVEL_RANK.get(level_str.strip().lower(), 0)
 
 
+_SKILL_REQ_SPLIT_RE = re.compile(r'\s*[-–—:]\s*')
+
+
+@lru_cache(maxsize=1024)
 def _parse_skill_req(req_str):
     """Parse 'Excel - średniozaawansowany' → ('excel', 2).
 
     Splits on ' - ', ' – ', ' — ', or ':'.
     Returns (skill_name_lower, min_rank) where min_rank=0 means no level specified.
+    Cached — the same position requirements are parsed for every ranked candidate.
     """
-    parts = re.split(r'\s*[-–—:]\s*', req_str.strip(), maxsplit=1)
+    parts = _SKILL_REQ_SPLIT_RE.split(req_str.strip(), maxsplit=1)
     name = parts[0].strip().lower()
     rank = _level_rank(parts[1]) if len(parts) > 1 else 0
     return name, rank
@@ -83,7 +90,7 @@ def _split_skills_deterministic(position, candidate_skills_lower, candidate_leve
     """Deterministic skill matching for ranking cards.
 
     Checks ALL position skills (required + optional) against the candidate's
-    profile using the same level-aware logic as the skill badge highlighting.
+    profile using level-aware name matching.
     This guarantees consistent results across all positions for the same
     candidate — no AI non-determinism, no grey zones.
 
@@ -99,12 +106,16 @@ def _split_skills_deterministic(position, candidate_skills_lower, candidate_leve
     def _evaluate(req_str, skill_type):
         req_name, min_rank = _parse_skill_req(req_str)
 
-        # Find a matching skill name in the candidate's profile
-        matched_skill_name = None
-        for s in candidate_skills_lower:
-            if req_name == s or req_name in s or s in req_name:
-                matched_skill_name = s
-                break
+        # Find a matching skill name in the candidate's profile — exact name
+        # via set lookup first, substring scan only when there is none
+        if req_name in candidate_skills_lower:
+            matched_skill_name = req_name
+        else:
+            matched_skill_name = None
+            for s in candidate_skills_lower:
+                if req_name in s or s in req_name:
+                    matched_skill_name = s
+                    break
 
         if matched_skill_name is None:
             missing.append({'text': req_str, 'type': skill_type})
@@ -241,20 +252,26 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.utils.translation import gettext as _
 from django.views.decorators.http import require_POST
-from django.db.models import Avg
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch, Subquery
 
-from cv.models import CVDocument
+from cv.models import CVDocument, CVSection
 from cv.services.parser import CVParser
 from cv.services.section_detector import SectionDetector
-from analysis.utils import start_cv_analysis
 from analysis.models import AnalysisResult
-from .models import JobPosition, CandidateProfile, JobFitResult, RequirementMatch, PositionWeightTemplate
+from analysis.services.progress import get_progress
+from .models import (
+    FIT_IN_FLIGHT_STATUSES, JobPosition, CandidateProfile, JobFitResult, RequirementMatch,
+    PositionWeightTemplate,
+)
+from .services.dashboard_stats import get_dashboard_stats, get_top_candidates
 from .forms import JobPositionForm, BulkUploadForm, CVUploadForm
 from .tasks import (
-    run_profile_extraction_in_thread,
+    extract_and_analyze_task,
     run_position_match_in_thread,
     run_bulk_matching_in_thread,
     run_selective_matching_in_thread,
+    selective_matching_task,
 )
 
 
@@ -266,24 +283,16 @@ from .tasks import (
 def dashboard_view(request):
     """Główny dashboard rekrutacyjny ze statystykami."""
 
-    positions = JobPosition.objects.filter(user=request.user, is_active=True)
-    profiles = CandidateProfile.objects.filter(user=request.user, status='done')
-
-    total_positions = positions.count()
-    total_candidates = profiles.count()
-    total_matches = JobFitResult.objects.filter(user=request.user, status='done').count()
-
-    recent_positions = positions[:5]
-    top_candidates = profiles.annotate(
-        avg_match=Avg('fit_results__overall_match'),
-    ).filter(avg_match__isnull=False).order_by('-avg_match')[:10]
+    # Liczniki i top kandydaci z cache per uzytkownik (krotki TTL + invalidacja sygnalami)
+    stats = get_dashboard_stats(request.user)
+    recent_positions = JobPosition.objects.filter(user=request.user, is_active=True)[:5]
 
     return render(request, 'recruitment/dashboard.html', {
-        'total_positions': total_positions,
-        'total_candidates': total_candidates,
-        'total_matches': total_matches,
+        'total_positions': stats['total_positions'],
+        'total_candidates': stats['total_candidates'],
+        'total_matches': stats['total_matches'],
         'recent_positions': recent_positions,
-        'top_candidates': top_candidates,
+        'top_candidates': get_top_candidates(request.user),
     })
 
 
@@ -385,9 +394,14 @@ def position_detail_view(request, position_id):
     if sort_by not in valid_sorts:
         sort_by = 'overall_match'
 
+    # Tylko kolumny uzywane przez tabele rankingu — bez ciezkich JSON-ow profilu
+    # (experience, education, raw_ai_response, ...)
     fit_results = JobFitResult.objects.filter(
         position=position, status='done',
-    ).select_related('candidate').order_by(f'-{sort_by}')
+    ).select_related('candidate').only(
+        'id', 'candidate', *valid_sorts,
+        'candidate__id', 'candidate__name', 'candidate__current_role', 'candidate__red_flags',
+    ).order_by(f'-{sort_by}')
 
     return render(request, 'recruitment/position_detail.html', {
         'position': position,
@@ -480,13 +494,16 @@ def candidate_list_view(request):
             for ci in CandidateIntelligence.objects.filter(profile_id__in=profile_ids)
         }
         # Attach fit positions per candidate (for hover popover)
+        # Only the 3 columns the popover renders — no model instances, no full Position rows
         fit_map: dict = {}
-        for fit in JobFitResult.objects.filter(
+        for candidate_id, title, score in JobFitResult.objects.filter(
             candidate_id__in=profile_ids, status='done',
-        ).select_related('position').order_by('candidate_id', '-overall_match'):
-            fit_map.setdefault(fit.candidate_id, []).append({
-                'title': fit.position.title,
-                'score': fit.overall_match,
+        ).order_by('candidate_id', '-overall_match').values_list(
+            'candidate_id', 'position__title', 'overall_match',
+        ):
+            fit_map.setdefault(candidate_id, []).append({
+                'title': title,
+                'score': score,
             })
         for p in profiles_list:
             p.intelligence = intel_map.get(p.id)
@@ -519,21 +536,15 @@ def candidate_upload_view(request):
             if position_ids:
                 request.session['selected_position_ids'] = position_ids
 
-            files_to_process = []
-
-            single_cv = form.cleaned_data.get('single_cv')
-            if single_cv:
-                files_to_process.append(single_cv)
-
-            multiple_cvs = request.FILES.getlist('multiple_cvs')
-            if multiple_cvs:
-                files_to_process.extend(multiple_cvs)
+            files_to_process = form.cleaned_data['files']
 
             uploaded_count = 0
             last_cv_doc = None
             from django.utils.translation import get_language as _get_language
             lang = (_get_language() or 'en')[:2]
             for uploaded_file in files_to_process:
+                # Each CV is saved in its own short transaction — a failing file
+                # does not roll back the ones already saved
                 cv_doc = _process_uploaded_cv(uploaded_file, request.user)
                 if cv_doc:
                     if cv_doc.injection_flag:
@@ -543,10 +554,13 @@ def candidate_upload_view(request):
                             % {'name': cv_doc.original_filename},
                         )
                     else:
-                        run_profile_extraction_in_thread(cv_doc.id, request.user.id, language=lang)
-
-                        # CV analysis (billing + history) — same logic as /cv/upload/
-                        start_cv_analysis(cv_doc, request.user, language=lang)
+                        # Profile extraction + CV analysis (billing + history) in a
+                        # Celery worker — the request only saves the files.
+                        # on_commit: the worker always sees the saved CVDocument
+                        transaction.on_commit(partial(
+                            extract_and_analyze_task.delay,
+                            str(cv_doc.id), request.user.id, language=lang,
+                        ))
 
                     uploaded_count += 1
                     last_cv_doc = cv_doc
@@ -577,11 +591,7 @@ def _process_uploaded_cv(uploaded_file, user):
     if not is_valid:
         return None
 
-    result = CVParser.parse(uploaded_file, filename)
-    if result['error'] or not result['text']:
-        return None
-
-    uploaded_file.seek(0)
+    # Hash (1 przebieg po chunkach) przed parsowaniem — duplikat nie jest parsowany
     from analysis.services.analyzer import CVAnalyzer
     file_hash = CVAnalyzer.compute_file_hash(uploaded_file)
 
@@ -592,8 +602,16 @@ def _process_uploaded_cv(uploaded_file, user):
             logger.info(f"Duplicate CV detected for user {user.id}: hash {file_hash[:8]} matches CV {existing.id}")
             return existing
 
+    result = CVParser.parse(uploaded_file, filename)
+    if result['error'] or not result['text']:
+        return None
+
     uploaded_file.seek(0)
-    cv_doc = CVDocument.objects.create(
+    sections = SectionDetector.detect_sections(result['text'])
+
+    # Dokument + sekcje atomowo (krotka transakcja per plik — parsowanie jest
+    # wyzej, poza nia); sekcje jednym INSERT-em
+    cv_doc = CVDocument(
         user=user,
         original_filename=filename,
         file=uploaded_file,
@@ -603,19 +621,27 @@ def _process_uploaded_cv(uploaded_file, user):
         file_hash=file_hash,
         title=filename.rsplit('.', 1)[0],
     )
-
-    sections = SectionDetector.detect_sections(result['text'])
-    from cv.models import CVSection
-    for s in sections:
-        CVSection.objects.create(
-            document=cv_doc,
-            section_type=s['type'],
-            title=s['title'],
-            content=s['content'],
-            start_position=s['start'],
-            end_position=s['end'],
-            order=s['order'],
-        )
+    try:
+        with transaction.atomic():
+            cv_doc.save()
+            CVSection.objects.bulk_create([
+                CVSection(
+                    document=cv_doc,
+                    section_type=s['type'],
+                    title=s['title'],
+                    content=s['content'],
+                    start_position=s['start'],
+                    end_position=s['end'],
+                    order=s['order'],
+                )
+                for s in sections
+            ], batch_size=500)
+    except Exception as e:
+        logger.error(f"Saving uploaded CV {filename} failed: {e}", exc_info=True)
+        # Plik zapisany w storage przed INSERT-em — nie zostawiamy sieroty
+        if cv_doc.file.name and cv_doc.file.storage.exists(cv_doc.file.name):
+            cv_doc.file.delete(save=False)
+        return None
 
     return cv_doc
 
@@ -626,13 +652,23 @@ def bulk_upload_view(request):
     return redirect('recruitment_candidate_upload')
 
 
+def _profile_status(cv_doc):
+    """Profil CV z samymi polami statusu — strony pollingu nie potrzebuja
+    extracted_text ani danych profilu (JSON-y skilli, doswiadczenia).
+
+    Raises:
+        CandidateProfile.DoesNotExist: ekstrakcja jeszcze nie utworzyla profilu
+    """
+    return CandidateProfile.objects.only('id', 'status', 'error_message').get(cv_document=cv_doc)
+
+
 @login_required
 def candidate_processing_view(request, cv_id):
     """Strona oczekiwania na ekstrakcję profilu."""
-    cv_doc = get_object_or_404(CVDocument, id=cv_id, user=request.user)
+    cv_doc = get_object_or_404(CVDocument.objects.only('id'), id=cv_id, user=request.user)
 
     try:
-        profile = cv_doc.candidate_profile
+        profile = _profile_status(cv_doc)
         if profile.status == 'done':
             return redirect('recruitment_candidate_detail', profile_id=profile.id)
         elif profile.status == 'partial':
@@ -653,10 +689,10 @@ def candidate_processing_view(request, cv_id):
 @login_required
 def candidate_status_api(request, cv_id):
     """JSON API dla pollingu statusu ekstrakcji profilu."""
-    cv_doc = get_object_or_404(CVDocument, id=cv_id, user=request.user)
+    cv_doc = get_object_or_404(CVDocument.objects.only('id'), id=cv_id, user=request.user)
 
     try:
-        profile = cv_doc.candidate_profile
+        profile = _profile_status(cv_doc)
         data = {'status': profile.status}
         if profile.status in ('done', 'partial'):
             from django.urls import reverse
@@ -766,9 +802,13 @@ def fit_result_detail_view(request, fit_id):
 def fit_status_api(request, fit_id):
     """JSON API dla pollingu statusu dopasowania."""
     fit = get_object_or_404(JobFitResult, id=fit_id, user=request.user)
+    progress = fit.progress
+    if fit.status not in ('done', 'partial', 'failed'):
+        # Pośredni postęp żyje w Redis (analysis.services.progress)
+        progress = get_progress(fit.id, progress)
     data = {
         'status': fit.status,
-        'progress': fit.progress,
+        'progress': progress,
         'overall_match': fit.overall_match,
     }
     if fit.status in ('done', 'partial'):
@@ -865,25 +905,18 @@ def select_positions_view(request, profile_id):
 
     positions = JobPosition.objects.filter(user=request.user, is_active=True).order_by('-created_at')
 
-    existing_fits = {
-        str(fit.position_id): fit
-        for fit in JobFitResult.objects.filter(
-            candidate=profile, status='done',
-        ).select_related('position')
-    }
-
-    positions_with_status = []
-    for pos in positions:
-        fit = existing_fits.get(str(pos.id))
-        positions_with_status.append({
-            'position': pos,
-            'existing_match': fit.overall_match if fit else None,
-            'fit_id': fit.id if fit else None,
-        })
+    # Istniejacy wynik (unique: kandydat + stanowisko) dolaczony podzapytaniem
+    existing_fit = JobFitResult.objects.filter(
+        position=OuterRef('pk'), candidate=profile, status='done',
+    ).order_by()
+    positions = positions.annotate(
+        existing_match=Subquery(existing_fit.values('overall_match')[:1]),
+        fit_id=Subquery(existing_fit.values('id')[:1]),
+    )
 
     return render(request, 'recruitment/select_positions.html', {
         'profile': profile,
-        'positions_with_status': positions_with_status,
+        'positions': positions,
     })
 
 
@@ -915,7 +948,7 @@ def selective_match_status_api(request, profile_id):
 
     pending_fits = JobFitResult.objects.filter(
         candidate=profile,
-        status__in=['pending', 'processing', 'pending_ai'],
+        status__in=FIT_IN_FLIGHT_STATUSES,
     )
 
     if pending_fits.exists():
@@ -932,20 +965,49 @@ def selective_match_status_api(request, profile_id):
 # Position Ranks
 # ---------------------------------------------------------------------------
 
+def _candidate_skill_data(profile):
+    """Skille kandydata w postaci do porownan (niezalezne od stanowiska).
+
+    Returns:
+        (skills_lower, levels) — skills_lower: frozenset lowercase skilli,
+        levels: skill_levels z lowercase kluczami i wartosciami
+    """
+    skills_lower = frozenset(skill.lower() for skill in (profile.skills or []))
+    levels = {
+        k.lower(): v.lower()
+        for k, v in (profile.skill_levels or {}).items()
+    }
+    return skills_lower, levels
+
+
 @login_required
 def position_ranks_view(request):
     """Ranking top 3 kandydatow per stanowisko z podswietlonymi skillami."""
-    positions = JobPosition.objects.filter(user=request.user, is_active=True).order_by('-created_at')
+    # Top 3 fitow per pozycja jednym zapytaniem (sliced Prefetch -> ROW_NUMBER() w SQL)
+    positions = (
+        JobPosition.objects
+        .filter(user=request.user, is_active=True)
+        .order_by('-created_at')
+        .prefetch_related(Prefetch(
+            'fit_results',
+            queryset=(
+                JobFitResult.objects
+                .filter(status='done')
+                .select_related('candidate')
+                .prefetch_related('requirement_matches')
+                .order_by('-overall_match')[:3]
+            ),
+            to_attr='top_fits',
+        ))
+    )
+
+    # Znormalizowane skille kandydata liczone raz na request — ten sam kandydat
+    # pojawia sie w top 3 wielu stanowisk
+    skill_data_by_profile = {}
 
     position_ranks = []
     for position in positions:
-        top_fits = list(
-            JobFitResult.objects
-            .filter(position=position, status='done')
-            .select_related('candidate')
-            .prefetch_related('requirement_matches')
-            .order_by('-overall_match')[:3]
-        )
+        top_fits = position.top_fits
 
         if not top_fits:
             position_ranks.append({
@@ -954,41 +1016,16 @@ def position_ranks_view(request):
             })
             continue
 
-        # Parse position requirements once: {'excel': 2, 'python': 0, ...}
-        req_skill_map = {}
-        for req in (position.required_skills or []):
-            req_name, min_rank = _parse_skill_req(req)
-            req_skill_map[req_name] = min_rank
-
         candidates = []
         for rank, fit in enumerate(top_fits, 1):
             profile = fit.candidate
-            candidate_skills = profile.skills or []
+            skill_data = skill_data_by_profile.get(profile.id)
+            if skill_data is None:
+                skill_data = skill_data_by_profile[profile.id] = _candidate_skill_data(profile)
+            candidate_skills_lower, candidate_levels = skill_data
 
-            # Candidate skill_levels normalised to lowercase keys and values
-            candidate_levels = {
-                k.lower(): v.lower()
-                for k, v in (profile.skill_levels or {}).items()
-            }
-
-            highlighted_skills = []
-            for skill in candidate_skills:
-                skill_lower = skill.lower()
-                is_match = False
-                for req_name, min_rank in req_skill_map.items():
-                    if req_name == skill_lower or req_name in skill_lower or skill_lower in req_name:
-                        if min_rank == 0:
-                            is_match = True
-                        else:
-                            candidate_level_str = candidate_levels.get(skill_lower, '')
-                            if candidate_level_str and _level_rank(candidate_level_str) >= min_rank:
-                                is_match = True
-                        break
-                highlighted_skills.append({'name': skill, 'is_match': is_match})
-
-            # Deterministic skill matching — same algorithm as badge highlighting.
-            # Required skills first, optional after. Consistent across all positions.
-            candidate_skills_lower = {s.lower() for s in candidate_skills}
+            # Deterministic skill matching — required skills first, optional after.
+            # Consistent across all positions.
             matched_reqs, missing_reqs = _split_skills_deterministic(
                 position, candidate_skills_lower, candidate_levels,
             )
@@ -1109,30 +1146,35 @@ def bulk_analysis_view(request):
         messages.error(request, _('Select at least one position.'))
         return redirect('recruitment_candidate_list')
 
-    positions = JobPosition.objects.filter(
-        id__in=position_ids, user=request.user, is_active=True,
-    )
-    if not positions.exists():
+    valid_position_ids = [
+        str(position_id) for position_id in JobPosition.objects.filter(
+            id__in=position_ids, user=request.user, is_active=True,
+        ).values_list('id', flat=True)
+    ]
+    if not valid_position_ids:
         messages.error(request, _('Select at least one position.'))
         return redirect('recruitment_candidate_list')
 
-    candidates = CandidateProfile.objects.filter(
+    # Tylko id kandydatow, strumieniowo — bez ladowania pelnych profili
+    candidate_ids = CandidateProfile.objects.filter(
         user=request.user, status='done',
-    )
-    if not candidates.exists():
+    ).values_list('id', flat=True).iterator(chunk_size=1000)
+
+    # Jedna grupa Celery (1 wywolanie brokera) zamiast watku per kandydat w procesie web
+    signatures = [
+        selective_matching_task.s(str(profile_id), request.user.id, valid_position_ids)
+        for profile_id in candidate_ids
+    ]
+    if not signatures:
         messages.warning(request, _('No candidates available for analysis.'))
         return redirect('recruitment_candidate_list')
 
-    valid_position_ids = [str(p.id) for p in positions]
-    for profile in candidates:
-        run_selective_matching_in_thread(
-            str(profile.id), request.user.id, valid_position_ids,
-        )
+    group(signatures).apply_async()
 
     messages.info(
         request,
         _('Bulk analysis started: %(candidates)s candidates × %(positions)s positions.')
-        % {'candidates': candidates.count(), 'positions': positions.count()},
+        % {'candidates': len(signatures), 'positions': len(valid_position_ids)},
     )
     return redirect('recruitment_candidate_list')
 
@@ -1140,10 +1182,12 @@ def bulk_analysis_view(request):
 @login_required
 def bulk_analysis_status_api(request):
     """JSON API: status zbiorczego matchingu."""
-    pending_count = JobFitResult.objects.filter(
+    pending_fits = JobFitResult.objects.filter(
         user=request.user,
-        status__in=['pending', 'processing', 'pending_ai'],
-    ).count()
+        status__in=FIT_IN_FLIGHT_STATUSES,
+    )
+    # Endpoint pollowany co kilka sekund — w stanie spoczynku wystarcza LIMIT 1
+    pending_count = pending_fits.count() if pending_fits.exists() else 0
 
     return JsonResponse({
         'status': 'processing' if pending_count > 0 else 'done',
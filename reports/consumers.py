@@ -0,0 +1,47 @@
+"""reports/consumers.py - WebSocket ze statusem generowania raportu PDF."""
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .models import Report
+from .services.status_push import report_group_name, report_status_payload
+
+
+class ReportStatusConsumer(AsyncJsonWebsocketConsumer):
+    """Wysyla klientowi status raportu, gdy worker skonczy generowanie."""
+
+    group_name = None
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        report_id = self.scope['url_route']['kwargs']['report_id']
+        # Najpierw zapis do grupy, potem odczyt statusu — raport zakonczony
+        # miedzy tymi krokami i tak trafi do klienta (push albo odczyt)
+        self.group_name = report_group_name(report_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+
+        report = await self._get_report(user, report_id)
+        if report is None:
+            await self.close()
+            return
+
+        await self.accept()
+        if report.status in ('done', 'failed'):
+            await self.send_json(report_status_payload(report))
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def report_status(self, event):
+        await self.send_json({k: v for k, v in event.items() if k != 'type'})
+
+    @database_sync_to_async
+    def _get_report(self, user, report_id):
+        return Report.objects.filter(pk=report_id, user=user).only(
+            'id', 'status', 'error_message',
+        ).first()
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-15 23:32
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fail_duplicate_active_reports(apps, schema_editor):
+    """Przed zalozeniem unikalnego indeksu zostawia 1 aktywny raport na analize.
+
+    Zostaje najnowszy 'done' (a gdy go brak — najnowszy w toku); pozostale
+    oznaczamy jako 'failed'.
+    """
+    Report = apps.get_model('reports', 'Report')
+    active = Report.objects.filter(status__in=['pending', 'processing', 'done'])
+    duplicated = (
+        active.values('analysis').annotate(n=Count('pk')).filter(n__gt=1)
+        .values_list('analysis', flat=True)
+    )
+    for analysis_id in duplicated:
+        reports = list(active.filter(analysis_id=analysis_id).order_by('-created_at'))
+        keep = next((r for r in reports if r.status == 'done'), reports[0])
+        Report.objects.filter(pk__in=[r.pk for r in reports if r.pk != keep.pk]).update(
+            status='failed', error_message='Superseded by another report.',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0008_analysisresult_injection_dismissed'),
+        ('reports', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_reports, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'processing', 'done'])), fields=('analysis',), name='one_active_report_per_analysis'),
+        ),
+    ]
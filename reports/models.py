@@ -10,6 +10,11 @@ def report_upload_path(instance, filename):
     return f'reports/{user_id}/{uuid.uuid4().hex}_{filename}'
 
 
+# Statusy "zywego" raportu — na analize moze przypadac najwyzej jeden taki
+# (unikalny indeks czesciowy); 'failed' moze sie powtarzac
+REPORT_ACTIVE_STATUSES = ['pending', 'processing', 'done']
+
+
 class Report(models.Model):
     """Wygenerowany raport PDF z wynikami analizy."""
 
@@ -38,6 +43,14 @@ class Report(models.Model):
     class Meta:
         ordering = ['-created_at']
         db_table = 'reports_report'
+        constraints = [
+            # Podwojny klik / pre-render + klik nie wygeneruja dwoch PDF-ow
+            # tej samej analizy — drugi INSERT konczy sie IntegrityError
+            models.UniqueConstraint(
+                fields=['analysis'], name='one_active_report_per_analysis',
+                condition=models.Q(status__in=REPORT_ACTIVE_STATUSES),
+            ),
+        ]
 
     def __str__(self):
         return f'Report {self.id} ({self.status})'
@@ -0,0 +1,9 @@
+"""reports/routing.py - Routing WebSocket modułu raportów PDF."""
+
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/reports/<uuid:report_id>/', consumers.ReportStatusConsumer.as_asgi()),
+]
@@ -1,8 +1,9 @@
 """reports/services/pdf_generator.py - Generowanie raportów PDF z ReportLab."""
 
-import io
 import logging
+from functools import lru_cache
 from django.core.files.base import ContentFile
+from django.db.models import prefetch_related_objects
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -12,7 +13,7 @@ from reportlab.platypus import (
     HRFlowable, KeepTogether,
 )
 
-from analysis.models import AnalysisResult
+from analysis.models import AnalysisResult, Problem, Recommendation, SectionAnalysis
 from reports.models import Report
 
 logger = logging.getLogger(__name__)
@@ -32,9 +33,51 @@ C_GREY_LIGHT = colors.HexColor('#f3f4f6')
 C_TEXT       = colors.HexColor('#111827')
 PAGE_W, PAGE_H = A4
 
-
+# Kolory i etykiety statusow/severity/priorytetow — stale dla kazdego raportu.
+# Etykiety z choices modeli zamiast get_*_display() per wiersz.
+_STATUS_FG = {'present': '#16a34a', 'missing': '#dc2626', 'weak': '#d97706'}
+_STATUS_LABEL = dict(SectionAnalysis.STATUS_CHOICES)
+_SEV_BG = {'critical': C_RED_LIGHT, 'warning': C_AMBER_LT, 'info': C_BLUE_LIGHT}
+_SEV_FG = {'critical': '#dc2626', 'warning': '#d97706', 'info': '#2563eb'}
+_SEV_LABEL_UPPER = {k: v.upper() for k, v in Problem.SEVERITY_CHOICES}
+_PRIO_FG = {'high': '#dc2626', 'medium': '#d97706', 'low': '#16a34a'}
+_PRIO_LABEL = dict(Recommendation.PRIORITY_CHOICES)
+
+# Style tabel powtarzanych per wiersz (kafelek problemu, tabela przepisanej
+# sekcji) — TableStyle jest tylko czytany przez Table.setStyle(), wiec jedna
+# instancja wystarcza dla wszystkich raportow. Samych flowables (Spacer,
+# HRFlowable) nie wspoldzielimy: drawOn() ustawia na nich self.canv.
+_BOX_PADDING = [
+    ('TOPPADDING',    (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('LEFTPADDING',   (0, 0), (-1, -1), 10),
+    ('RIGHTPADDING',  (0, 0), (-1, -1), 10),
+]
+_PROBLEM_BOX_STYLES = {
+    severity: TableStyle([('BACKGROUND', (0, 0), (-1, -1), bg)] + _BOX_PADDING)
+    for severity, bg in _SEV_BG.items()
+}
+_PROBLEM_BOX_STYLE_DEFAULT = TableStyle(
+    [('BACKGROUND', (0, 0), (-1, -1), C_GREY_LIGHT)] + _BOX_PADDING
+)
+_REWRITE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND',    (0, 0), (0, -1), C_GREY_LIGHT),
+    ('BACKGROUND',    (1, 0), (1, -1), C_GREEN_LT),
+    ('VALIGN',        (0, 0), (-1, -1), 'TOP'),
+    ('TOPPADDING',    (0, 0), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('LEFTPADDING',   (0, 0), (-1, -1), 8),
+    ('GRID',          (0, 0), (-1, -1), 0.5, colors.white),
+])
+
+
+@lru_cache(maxsize=1)
 def _build_styles():
-    """Returns a dict of named ParagraphStyles used throughout the document."""
+    """Returns a dict of named ParagraphStyles used throughout the document.
+
+    Built once per process — getSampleStyleSheet() + derived styles are the same
+    for every report and are only read while building.
+    """
     base = getSampleStyleSheet()
     s = {}
     s['title'] = ParagraphStyle(
@@ -101,33 +144,40 @@ class PDFGenerator:
         """
         report = Report.objects.select_related(
             'analysis', 'analysis__cv_document', 'user',
-        ).prefetch_related(
-            'analysis__section_analyses',
-            'analysis__problems',
-            'analysis__recommendations',
-            'analysis__skill_gaps',
-            'analysis__rewrites',
         ).get(id=report_id)
+        # Ponowne dostarczenie zadania (acks_late) po udanym renderze — nic do zrobienia
+        if report.status == 'done' and report.file:
+            logger.info('Report %s already generated, skipping', report_id)
+            return report
 
-        analysis = report.analysis
+        # Zmiany statusu waskim UPDATE-em — bez przepisywania calego wiersza.
+        # Warunek na status: ponownie dostarczone zadanie raportu, ktory widok
+        # uznal juz za zawieszony (failed), nie wskrzesza go obok nowego
+        if not Report.objects.filter(
+            pk=report.pk, status__in=['pending', 'processing'],
+        ).update(status='processing'):
+            report.refresh_from_db(fields=['status'])
+            logger.info('Report %s is %s, skipping', report_id, report.status)
+            return report
         report.status = 'processing'
-        report.save(update_fields=['status'])
+
+        analysis = report.analysis
+        prefetch_related_objects(
+            [analysis], 'section_analyses', 'problems', 'recommendations', 'rewrites',
+        )
 
         try:
             # Materialize all prefetched relations once (no extra DB hits below)
             section_analyses = list(analysis.section_analyses.all())
             problems         = list(analysis.problems.all())
             recommendations  = list(analysis.recommendations.all())
-            skill_gaps       = list(analysis.skill_gaps.all())
+            # Tabela luk kompetencyjnych czyta tylko 4 kolumny — krotki zamiast modeli
+            skill_gaps       = list(analysis.skill_gaps.values_list(
+                'skill_name', 'current_level', 'recommended_level', 'importance',
+            ))
             rewrites         = list(analysis.rewrites.all())
 
             s = _build_styles()
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(
-                buffer, pagesize=A4,
-                rightMargin=2 * cm, leftMargin=2 * cm,
-                topMargin=2 * cm, bottomMargin=2.5 * cm,
-            )
             elements = []
             col_full = PAGE_W - 4 * cm
 
@@ -214,20 +264,16 @@ class PDFGenerator:
                 elements.append(HRFlowable(width='100%', color=C_BLUE_LIGHT, thickness=1))
                 elements.append(Spacer(1, 0.15 * cm))
 
-                STATUS_COLOR = {
-                    'present': '#16a34a',
-                    'missing': '#dc2626',
-                    'weak':    '#d97706',
-                }
                 for sa in section_analyses:
-                    fg_hex = STATUS_COLOR.get(sa.status, '#6b7280')
-                    block = [Paragraph(
+                    fg_hex = _STATUS_FG.get(sa.status, '#6b7280')
+                    # Naglowek + tekst w jednym Paragraph (1 parsowanie markupu zamiast 2)
+                    parts = [
                         f'<b>{_escape(sa.section.title())}</b>'
-                        f' <font color="{fg_hex}">[{sa.get_status_display()}]</font>',
-                        s['body'],
-                    )]
+                        f' <font color="{fg_hex}">[{_STATUS_LABEL.get(sa.status, sa.status)}]</font>'
+                    ]
                     if sa.analysis_text:
-                        block.append(Paragraph(_escape(sa.analysis_text), s['body']))
+                        parts.append(_escape(sa.analysis_text))
+                    block = [Paragraph('<br/>'.join(parts), s['body'])]
                     for tip in (sa.suggestions or []):
                         block.append(Paragraph(f'\u2022 {_escape(tip)}', s['italic']))
                     block.append(Spacer(1, 0.2 * cm))
@@ -239,18 +285,14 @@ class PDFGenerator:
                 elements.append(HRFlowable(width='100%', color=C_BLUE_LIGHT, thickness=1))
                 elements.append(Spacer(1, 0.15 * cm))
 
-                SEV_BG = {'critical': C_RED_LIGHT, 'warning': C_AMBER_LT, 'info': C_BLUE_LIGHT}
-                SEV_FG = {'critical': '#dc2626',   'warning': '#d97706',   'info': '#2563eb'}
                 for p in problems:
-                    bg     = SEV_BG.get(p.severity, C_GREY_LIGHT)
-                    fg_hex = SEV_FG.get(p.severity, '#6b7280')
+                    fg_hex = _SEV_FG.get(p.severity, '#6b7280')
                     inner  = [
                         Paragraph(
-                            f'<font color="{fg_hex}"><b>[{p.get_severity_display().upper()}]</b></font>'
-                            f' <b>{_escape(p.title)}</b>',
+                            f'<font color="{fg_hex}"><b>[{_SEV_LABEL_UPPER.get(p.severity, p.severity.upper())}]</b></font>'
+                            f' <b>{_escape(p.title)}</b><br/>{_escape(p.description)}',
                             s['body'],
                         ),
-                        Paragraph(_escape(p.description), s['body']),
                     ]
                     if p.affected_text:
                         inner.append(Paragraph(
@@ -258,13 +300,7 @@ class PDFGenerator:
                             s['italic'],
                         ))
                     box = Table([[inner]], colWidths=[col_full])
-                    box.setStyle(TableStyle([
-                        ('BACKGROUND',    (0, 0), (-1, -1), bg),
-                        ('TOPPADDING',    (0, 0), (-1, -1), 6),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                        ('LEFTPADDING',   (0, 0), (-1, -1), 10),
-                        ('RIGHTPADDING',  (0, 0), (-1, -1), 10),
-                    ]))
+                    box.setStyle(_PROBLEM_BOX_STYLES.get(p.severity, _PROBLEM_BOX_STYLE_DEFAULT))
                     elements.append(KeepTogether([box, Spacer(1, 0.2 * cm)]))
 
             # ── Recommendations ───────────────────────────────────────────────
@@ -273,16 +309,14 @@ class PDFGenerator:
                 elements.append(HRFlowable(width='100%', color=C_BLUE_LIGHT, thickness=1))
                 elements.append(Spacer(1, 0.15 * cm))
 
-                PRIO_FG = {'high': '#dc2626', 'medium': '#d97706', 'low': '#16a34a'}
                 for r in recommendations:
-                    fg_hex = PRIO_FG.get(r.priority, '#6b7280')
+                    fg_hex = _PRIO_FG.get(r.priority, '#6b7280')
                     block  = [
                         Paragraph(
-                            f'<font color="{fg_hex}"><b>[{r.get_priority_display()}]</b></font>'
-                            f' <b>{_escape(r.title)}</b>',
+                            f'<font color="{fg_hex}"><b>[{_PRIO_LABEL.get(r.priority, r.priority)}]</b></font>'
+                            f' <b>{_escape(r.title)}</b><br/>{_escape(r.description)}',
                             s['body'],
                         ),
-                        Paragraph(_escape(r.description), s['body']),
                     ]
                     if r.suggested_text:
                         block.append(Paragraph(
@@ -303,12 +337,12 @@ class PDFGenerator:
                     Paragraph('<b>Recommended</b>', s['label']),
                     Paragraph('<b>Importance</b>', s['label']),
                 ]]
-                for sg in skill_gaps:
+                for skill_name, current_level, recommended_level, importance in skill_gaps:
                     sg_rows.append([
-                        Paragraph(_escape(sg.skill_name), s['body']),
-                        Paragraph(_escape(sg.current_level or '\u2014'), s['body']),
-                        Paragraph(_escape(sg.recommended_level or '\u2014'), s['body']),
-                        Paragraph(_escape(sg.importance), s['body']),
+                        Paragraph(_escape(skill_name), s['body']),
+                        Paragraph(_escape(current_level or '\u2014'), s['body']),
+                        Paragraph(_escape(recommended_level or '\u2014'), s['body']),
+                        Paragraph(_escape(importance), s['body']),
                     ])
                 sg_tbl = Table(sg_rows, colWidths=[5.5 * cm, 3 * cm, 3 * cm, 3 * cm])
                 sg_tbl.setStyle(TableStyle([
@@ -342,15 +376,7 @@ class PDFGenerator:
                         ],
                         colWidths=[half, half],
                     )
-                    rw_tbl.setStyle(TableStyle([
-                        ('BACKGROUND',    (0, 0), (0, -1), C_GREY_LIGHT),
-                        ('BACKGROUND',    (1, 0), (1, -1), C_GREEN_LT),
-                        ('VALIGN',        (0, 0), (-1, -1), 'TOP'),
-                        ('TOPPADDING',    (0, 0), (-1, -1), 6),
-                        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                        ('LEFTPADDING',   (0, 0), (-1, -1), 8),
-                        ('GRID',          (0, 0), (-1, -1), 0.5, colors.white),
-                    ]))
+                    rw_tbl.setStyle(_REWRITE_TABLE_STYLE)
                     elements.append(KeepTogether([
                         Paragraph(f'<b>{_escape(rw.section_type.title())}</b>', s['body']),
                         Spacer(1, 0.1 * cm),
@@ -359,26 +385,44 @@ class PDFGenerator:
                     ]))
 
             # ── Build ─────────────────────────────────────────────────────────
-            doc.build(elements, onFirstPage=_page_footer, onLaterPages=_page_footer)
-
-            pdf_bytes = buffer.getvalue()
-            buffer.close()
-
             safe_name = (
                 analysis.cv_document.original_filename
                 .replace(' ', '_').replace('/', '-')[:50]
             )
             filename = f'cv_report_{safe_name}.pdf'
 
-            report.file.save(filename, ContentFile(pdf_bytes), save=False)
+            # ReportLab pisze PDF prosto do pliku w storage — bez bufora
+            # BytesIO i kopii getvalue() w pamieci workera
+            report.file.save(filename, ContentFile(b''), save=False)
+            with report.file.storage.open(report.file.name, 'wb') as fh:
+                doc = SimpleDocTemplate(
+                    fh, pagesize=A4,
+                    rightMargin=2 * cm, leftMargin=2 * cm,
+                    topMargin=2 * cm, bottomMargin=2.5 * cm,
+                )
+                doc.build(elements, onFirstPage=_page_footer, onLaterPages=_page_footer)
+
+            # Tylko raport wciaz 'processing' — jesli w trakcie renderu widok
+            # oznaczyl go jako failed i zlecil nowy, ten plik jest zbedny
+            if not Report.objects.filter(pk=report.pk, status='processing').update(
+                status='done', error_message='', file=report.file.name,
+            ):
+                logger.warning('Report %s was replaced during rendering, discarding file', report_id)
+                report.file.delete(save=False)
+                report.refresh_from_db(fields=['status', 'error_message'])
+                return report
             report.status = 'done'
             report.error_message = ''
-            report.save()
             return report
 
         except Exception as e:
-            logger.error(f'PDF generation failed for report {report_id}: {e}', exc_info=True)
+            logger.error('PDF generation failed for report %s: %s', report_id, e, exc_info=True)
+            if report.file:
+                # Plik zaalokowany przed buildem — nie zostawiamy pustego/uszkodzonego PDF
+                report.file.delete(save=False)
             report.status = 'failed'
             report.error_message = str(e)
-            report.save(update_fields=['status', 'error_message'])
+            Report.objects.filter(pk=report.pk).update(
+                status='failed', error_message=report.error_message,
+            )
             return report
@@ -0,0 +1,48 @@
+"""reports/services/status_push.py - Powiadomienia o statusie raportu przez Channels (WebSocket).
+
+Strona "generating" slucha na ws/reports/<id>/ (reports/consumers.py) zamiast
+pollowac report_status_api co 1.5s. Worker Celery po zakonczeniu generowania
+wysyla status do grupy raportu przez channel layer (Redis). Bez channel layera
+(CHANNEL_LAYERS nieustawione, Redis niedostepny) push jest pomijany — strona
+wraca wtedy do pollingu.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+
+try:
+    from channels.layers import get_channel_layer
+except ImportError:
+    get_channel_layer = None
+
+logger = logging.getLogger(__name__)
+
+
+def report_group_name(report_id):
+    return f'report_{report_id}'
+
+
+def report_status_payload(report):
+    """Tresc odpowiedzi statusu — wspolna dla report_status_api i WebSocketu."""
+    data = {'status': report.status}
+    if report.status == 'done':
+        data['download_url'] = reverse('report_download', args=[report.id])
+    elif report.status == 'failed':
+        data['error'] = report.error_message
+    return data
+
+
+def push_report_status(report):
+    """Wysyla aktualny status raportu do klientow podlaczonych do jego grupy."""
+    layer = get_channel_layer() if get_channel_layer is not None else None
+    if layer is None:
+        return
+    try:
+        async_to_sync(layer.group_send)(
+            report_group_name(report.id),
+            {'type': 'report.status', **report_status_payload(report)},
+        )
+    except Exception as e:
+        logger.warning('Report status push failed for %s: %s', report.id, e)
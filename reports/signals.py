@@ -0,0 +1,56 @@
+"""reports/signals.py - Pre-render raportu PDF po zakonczeniu analizy CV.
+
+Uzytkownik z pdf_export dostaje PDF generowany w tle zaraz po analizie —
+gdy kliknie "export", plik zwykle juz istnieje i generate_report_view robi
+od razu redirect do pobrania zamiast strony pollingu.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from analysis.models import AnalysisResult
+from reports.models import REPORT_ACTIVE_STATUSES, Report
+from reports.tasks import generate_pdf_report_task
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=AnalysisResult)
+def prerender_report_on_analysis_done(sender, instance, created, update_fields=None, **kwargs):
+    # Tylko koncowy zapis CVAnalyzer.run_analysis (pelny save ze statusem 'done');
+    # klony z cache (created=True) i zapisy czesciowe (update_fields) pomijamy
+    if created or update_fields is not None or instance.status != 'done':
+        return
+    # Receiver dziala wewnatrz analysis.save() — pre-render jest opcjonalny,
+    # blad DB/brokera nie moze oznaczyc gotowej analizy jako failed
+    try:
+        user = instance.user
+        if user is None or not user.has_feature('pdf_export'):
+            return
+        # Savepoint — blad zapytania nie psuje transakcji wywolujacego
+        with transaction.atomic():
+            report, created = Report.objects.get_or_create(
+                analysis=instance, status__in=REPORT_ACTIVE_STATUSES,
+                defaults={'user': user, 'status': 'pending'},
+            )
+        if created:
+            report_id = report.id
+            transaction.on_commit(lambda: _enqueue_report(report_id), robust=True)
+    except Exception as e:
+        logger.error('PDF pre-render for analysis %s failed: %s', instance.pk, e, exc_info=True)
+
+
+def _enqueue_report(report_id):
+    try:
+        result = generate_pdf_report_task.delay(str(report_id))
+    except Exception:
+        # Bez zadania raport wisialby jako 'pending' — 'failed' zwalnia miejsce
+        # (one_active_report_per_analysis) i export wygeneruje go od nowa
+        Report.objects.filter(pk=report_id).update(
+            status='failed', error_message='Could not enqueue report generation.',
+        )
+        raise
+    Report.objects.filter(pk=report_id).update(celery_task_id=result.id)
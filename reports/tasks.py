@@ -2,21 +2,39 @@
 
 import logging
 from celery import shared_task
+from django.db import OperationalError
+
+try:
+    from botocore.exceptions import BotoCoreError
+except ImportError:
+    BotoCoreError = None
 
 logger = logging.getLogger(__name__)
 
+# Bledy przejsciowe (zerwane polaczenie z DB, blad S3) — ponawiamy z wykladniczym
+# opoznieniem i jitterem, zeby po awarii zadania nie wracaly wszystkie naraz
+PDF_TASK_RETRY_FOR = (OperationalError,) + ((BotoCoreError,) if BotoCoreError else ())
+
 
-@shared_task(bind=True, max_retries=1, default_retry_delay=15)
+@shared_task(
+    bind=True, acks_late=True, autoretry_for=PDF_TASK_RETRY_FOR, max_retries=3,
+    retry_backoff=10, retry_backoff_max=300, retry_jitter=True,
+)
 def generate_pdf_report_task(self, report_id):
-    """Generuje raport PDF jako zadanie Celery."""
+    """Generuje raport PDF jako zadanie Celery.
+
+    acks_late: wiadomosc potwierdzana dopiero po wykonaniu, wiec zadanie
+    przerwane razem z workerem wraca do kolejki i trafia do wolnego workera.
+    Ponowne dostarczenie gotowego raportu PDFGenerator.generate() pomija.
+    Bledy renderowania generate() sam zapisuje jako 'failed' — tu docieraja
+    tylko bledy poza nim (np. DB przy pobraniu raportu).
+    """
     from reports.services.pdf_generator import PDFGenerator
+    from reports.services.status_push import push_report_status
 
-    try:
-        result = PDFGenerator.generate(report_id)
-        return {
-            'report_id': str(result.id),
-            'status': result.status,
-        }
-    except Exception as exc:
-        logger.error(f"PDF report task failed: {exc}")
-        raise self.retry(exc=exc)
+    result = PDFGenerator.generate(report_id)
+    push_report_status(result)
+    return {
+        'report_id': str(result.id),
+        'status': result.status,
+    }
@@ -1,3 +1,204 @@
-from django.test import TestCase
+"""reports/tests.py — Raporty PDF: jeden aktywny raport na analizę, wygaszanie zawieszonych.
 
-# Create your tests here.
+Uruchomienie:
+    python manage.py test reports --verbosity=2
+
+Unikalny indeks częściowy one_active_report_per_analysis (status pending /
+processing / done) + get_or_create w generate_report_view. Raport starszy niż
+PRERENDER_MAX_WAIT jest wygaszany tylko, gdy jego zadanie nie jest w toku;
+PDFGenerator.generate() nie wskrzesza wygaszonego raportu.
+Testy NIE korzystają z Celery ani z OpenAI API (zadanie PDF podmienione).
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from reportlab.platypus import SimpleDocTemplate
+
+from accounts.models import User
+from analysis.models import AnalysisResult
+from cv.models import CVDocument
+from reports.models import REPORT_ACTIVE_STATUSES, Report
+from reports.services.pdf_generator import PDFGenerator
+
+
+def _done_analysis():
+    """Uzytkownik z pdf_export + zakonczona analiza.
+
+    Analiza tworzona od razu jako 'done' (created=True) — bez pre-renderu z reports/signals.py.
+    """
+    user = User.objects.create(username='anna', email='anna@example.com', plan='premium')
+    doc = CVDocument.objects.create(
+        user=user, original_filename='cv.pdf', file='cv.pdf', file_format='pdf',
+        extracted_text='Anna Nowak\nBackend Engineer',
+    )
+    return user, AnalysisResult.objects.create(user=user, cv_document=doc, status='done')
+
+
+class OneActiveReportTest(TestCase):
+
+    def setUp(self):
+        self.user, self.analysis = _done_analysis()
+
+    def _report(self, status):
+        return Report.objects.create(user=self.user, analysis=self.analysis, status=status)
+
+    def test_second_active_report_is_rejected(self):
+        for first in REPORT_ACTIVE_STATUSES:
+            for second in REPORT_ACTIVE_STATUSES:
+                with self.subTest(first=first, second=second):
+                    report = self._report(first)
+                    with self.assertRaises(IntegrityError), transaction.atomic():
+                        self._report(second)
+                    report.delete()
+
+    def test_failed_reports_may_repeat(self):
+        self._report('failed')
+        self._report('failed')
+        self._report('done')
+
+        self.assertEqual(Report.objects.filter(analysis=self.analysis).count(), 3)
+
+    def test_failed_report_frees_the_slot(self):
+        report = self._report('pending')
+        Report.objects.filter(pk=report.pk).update(status='failed')
+
+        self._report('pending')
+
+        self.assertEqual(Report.objects.filter(analysis=self.analysis, status='pending').count(), 1)
+
+
+@patch('reports.views.generate_pdf_report_task')
+class GenerateReportViewTest(TestCase):
+
+    def setUp(self):
+        self.user, self.analysis = _done_analysis()
+        self.client.force_login(self.user)
+        self.url = reverse('report_generate', args=[self.analysis.id])
+
+    def _stale_report(self, age=timedelta(minutes=10), **fields):
+        report = Report.objects.create(user=self.user, analysis=self.analysis, status='pending', **fields)
+        Report.objects.filter(pk=report.pk).update(created_at=report.created_at - age)
+        return report
+
+    def test_repeated_click_reuses_report(self, task):
+        task.delay.return_value = MagicMock(id='task-1')
+
+        self.client.get(self.url, secure=True)
+        self.client.get(self.url, secure=True)
+
+        self.assertEqual(Report.objects.filter(analysis=self.analysis).count(), 1)
+        task.delay.assert_called_once()
+
+    def test_done_report_redirects_to_download(self, task):
+        report = Report.objects.create(user=self.user, analysis=self.analysis, status='done')
+
+        response = self.client.get(self.url, secure=True)
+
+        self.assertRedirects(
+            response, reverse('report_download', args=[report.id]), fetch_redirect_response=False,
+        )
+        task.delay.assert_not_called()
+
+    def test_stale_prerender_is_replaced(self, task):
+        task.delay.return_value = MagicMock(id='task-2')
+        stale = self._stale_report()
+
+        self.client.get(self.url, secure=True)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertEqual(
+            Report.objects.filter(analysis=self.analysis, status__in=REPORT_ACTIVE_STATUSES).count(), 1,
+        )
+        task.delay.assert_called_once()
+
+    @patch('reports.views.AsyncResult')
+    def test_stale_report_with_running_task_is_kept(self, async_result, task):
+        async_result.return_value.state = 'STARTED'
+        stale = self._stale_report(celery_task_id='task-running')
+
+        self.client.get(self.url, secure=True)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'pending')
+        async_result.assert_called_once_with('task-running')
+        task.delay.assert_not_called()
+
+    @patch('reports.views.AsyncResult')
+    def test_stale_report_with_finished_task_is_replaced(self, async_result, task):
+        task.delay.return_value = MagicMock(id='task-3')
+        async_result.return_value.state = 'FAILURE'
+        stale = self._stale_report(celery_task_id='task-lost')
+
+        self.client.get(self.url, secure=True)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        task.delay.assert_called_once()
+
+    @patch('reports.views.AsyncResult')
+    def test_report_past_max_wait_is_replaced_even_if_pending(self, async_result, task):
+        # PENDING = takze zadanie utracone (nieznane id)
+        task.delay.return_value = MagicMock(id='task-4')
+        async_result.return_value.state = 'PENDING'
+        stale = self._stale_report(age=timedelta(hours=2), celery_task_id='task-unknown')
+
+        self.client.get(self.url, secure=True)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        task.delay.assert_called_once()
+
+
+class PDFGeneratorStatusTest(TestCase):
+
+    def setUp(self):
+        self.user, self.analysis = _done_analysis()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _report(self, status):
+        return Report.objects.create(user=self.user, analysis=self.analysis, status=status)
+
+    def test_renders_pending_report(self):
+        report = PDFGenerator.generate(self._report('pending').id)
+
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'done')
+        self.assertTrue(report.file.storage.exists(report.file.name))
+
+    def test_expired_report_is_not_resurrected(self):
+        report = self._report('failed')
+
+        with patch('reports.services.pdf_generator.SimpleDocTemplate') as doc:
+            PDFGenerator.generate(report.id)
+
+        doc.assert_not_called()
+        report.refresh_from_db()
+        self.assertEqual((report.status, report.file.name), ('failed', ''))
+
+    def test_report_expired_during_rendering_discards_file(self):
+        report = self._report('pending')
+        build = SimpleDocTemplate.build
+
+        def expire_then_build(doc, *args, **kwargs):
+            Report.objects.filter(pk=report.pk).update(status='failed', error_message='timed out')
+            build(doc, *args, **kwargs)
+
+        with patch('reports.services.pdf_generator.SimpleDocTemplate.build', expire_then_build):
+            result = PDFGenerator.generate(report.id)
+
+        self.assertEqual(result.status, 'failed')
+        report.refresh_from_db()
+        self.assertEqual((report.status, report.file.name), ('failed', ''))
+        self.assertEqual([files for _, _, files in os.walk(self.media_root) if files], [])
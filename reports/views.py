@@ -1,14 +1,51 @@
 """reports/views.py - Widoki generowania i pobierania raportów PDF."""
 
+import logging
+from datetime import timedelta
+
+from celery.result import AsyncResult
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, FileResponse
+from django.http import JsonResponse, FileResponse, HttpResponseRedirect
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
 from analysis.models import AnalysisResult
-from .models import Report
+from .models import REPORT_ACTIVE_STATUSES, Report
+from .services.status_push import report_status_payload
 from .tasks import generate_pdf_report_task
 
+try:
+    from storages.backends.s3 import S3Boto3Storage
+except ImportError:
+    S3Boto3Storage = None
+
+logger = logging.getLogger(__name__)
+
+PRERENDER_MAX_WAIT = timedelta(minutes=5)
+# Stany zadania Celery, przy ktorych raport wciaz moze zostac wyrenderowany
+# (PENDING = w kolejce; bez CELERY_TASK_TRACK_STARTED takze w trakcie)
+TASK_IN_FLIGHT_STATES = ('PENDING', 'STARTED', 'RETRY')
+# PENDING zwraca tez zadanie utracone (nieznane id) — po tym czasie raport
+# wygaszamy niezaleznie od stanu zadania
+REPORT_TASK_MAX_WAIT = timedelta(hours=1)
+# Waznosc podpisanego linku do pobrania raportu z S3 (sekundy)
+SIGNED_URL_EXPIRE = 300
+
+
+def _task_in_flight(task_id):
+    """Czy zadanie Celery raportu czeka w kolejce lub jest wykonywane."""
+    if not task_id:
+        return False
+    try:
+        return AsyncResult(task_id).state in TASK_IN_FLIGHT_STATES
+    except Exception as e:
+        # Backend wynikow niedostepny — nie wygaszamy raportu na slepo
+        logger.warning('Could not read state of report task %s: %s', task_id, e)
+        return True
+
 
 @login_required
 def generate_report_view(request, analysis_id):
@@ -21,15 +58,35 @@ def generate_report_view(request, analysis_id):
         AnalysisResult, id=analysis_id, user=request.user, status='done'
     )
 
-    existing = Report.objects.filter(analysis=analysis, status='done').first()
-    if existing:
-        return redirect('report_download', report_id=existing.id)
+    # Raport pre-renderowany po analizie (reports/signals.py) jeszcze w toku —
+    # czekamy na niego zamiast generowac drugi. Starszy niz PRERENDER_MAX_WAIT
+    # traktujemy jak zawieszony (failed + nowy raport), ale tylko gdy jego
+    # zadanie nie jest juz w kolejce ani w trakcie — inaczej worker i nowy
+    # raport renderowalyby ten sam PDF dwa razy.
+    now = timezone.now()
+    stale = Report.objects.filter(
+        analysis=analysis, status__in=['pending', 'processing'],
+        created_at__lt=now - PRERENDER_MAX_WAIT,
+    ).values_list('pk', 'celery_task_id', 'created_at')
+    expired = [
+        pk for pk, task_id, created_at in stale
+        if created_at < now - REPORT_TASK_MAX_WAIT or not _task_in_flight(task_id)
+    ]
+    if expired:
+        Report.objects.filter(pk__in=expired, status__in=['pending', 'processing']).update(
+            status='failed', error_message='Report generation timed out.',
+        )
 
-    report = Report.objects.create(
-        user=request.user,
-        analysis=analysis,
-        status='pending',
+    # Najwyzej 1 aktywny raport na analize (unikalny indeks) — przy wyscigu
+    # drugi get_or_create dostaje IntegrityError i zwraca raport pierwszego
+    report, created = Report.objects.get_or_create(
+        analysis=analysis, status__in=REPORT_ACTIVE_STATUSES,
+        defaults={'user': request.user, 'status': 'pending'},
     )
+    if not created:
+        if report.status == 'done':
+            return redirect('report_download', report_id=report.id)
+        return render(request, 'reports/generating.html', {'report': report})
 
     task = generate_pdf_report_task.delay(str(report.id))
     report.celery_task_id = task.id
@@ -38,20 +95,35 @@ def generate_report_view(request, analysis_id):
     return render(request, 'reports/generating.html', {'report': report})
 
 
+def _status_etag(request, report_id):
+    # Odpowiedz statusu zalezy tylko od statusu (error_message ustawiany razem
+    # z 'failed') — ETag = status, liczony 1 kolumnowym SELECT-em po PK.
+    # Last-Modified z sekundowa rozdzielczoscia zgubilby szybkie zmiany
+    # pending -> processing -> done miedzy dwoma pollami.
+    return Report.objects.filter(
+        pk=report_id, user=request.user,
+    ).values_list('status', flat=True).first()
+
+
+def _download_etag(request, report_id):
+    # Gotowy plik raportu sie nie zmienia, a jego nazwa zawiera uuid
+    return Report.objects.filter(
+        pk=report_id, user=request.user, status='done',
+    ).values_list('file', flat=True).first() or None
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_status_etag)
 def report_status_api(request, report_id):
-    """JSON endpoint do pollingu statusu raportu."""
+    """JSON endpoint do pollingu statusu raportu (fallback, gdy WebSocket niedostepny)."""
     report = get_object_or_404(Report, id=report_id, user=request.user)
-    data = {'status': report.status}
-    if report.status == 'done':
-        from django.urls import reverse
-        data['download_url'] = reverse('report_download', args=[report.id])
-    elif report.status == 'failed':
-        data['error'] = report.error_message
-    return JsonResponse(data)
+    return JsonResponse(report_status_payload(report))
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_download_etag)
 def download_report_view(request, report_id):
     """Pobieranie wygenerowanego raportu PDF."""
     report = get_object_or_404(Report, id=report_id, user=request.user, status='done')
@@ -60,8 +132,14 @@ def download_report_view(request, report_id):
         messages.error(request, 'Report file not found.')
         return redirect('dashboard')
 
-    return FileResponse(
-        report.file.open('rb'),
-        as_attachment=True,
-        filename=f'cv_analysis_report_{report.analysis_id}.pdf',
-    )
+    filename = f'cv_analysis_report_{report.analysis_id}.pdf'
+    storage = report.file.storage
+    if S3Boto3Storage is not None and isinstance(storage, S3Boto3Storage):
+        # Klient pobiera plik prosto z S3 (podpisany link) — worker nie
+        # przepycha bajtow PDF przez caly czas pobierania
+        return HttpResponseRedirect(storage.url(
+            report.file.name, expire=SIGNED_URL_EXPIRE,
+            parameters={'ResponseContentDisposition': f'attachment; filename="{filename}"'},
+        ))
+
+    return FileResponse(report.file.open('rb'), as_attachment=True, filename=filename)